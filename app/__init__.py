@@ -4,6 +4,7 @@ import sqlite3
 
 import markdown
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_cors import CORS
 from .config import Config
 from .extensions import db, socketio, login_manager, mail
@@ -41,6 +42,12 @@ def create_app(config_filename=None):
     except OSError:
         pass
 
+    # Reuse compiled templates across processes when a bytecode cache dir is configured
+    bytecode_cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
     # Enable CORS
     CORS(app, resources={r"/*": {"origins": "*"}}) # Allow all for dev, adjust later
 
@@ -48,7 +55,13 @@ def create_app(config_filename=None):
     db.init_app(app)
     login_manager.init_app(app) # Initialize LoginManager
     mail.init_app(app) # Initialize Mail
-    socketio.init_app(app, cors_allowed_origins="*", async_mode="eventlet")
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode="eventlet",
+        serializer=app.config["SOCKETIO_SERIALIZER"],
+        message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"],
+    )
     # Register Socket.IO event handlers
     from . import sockets  # noqa: F401
 
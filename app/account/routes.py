@@ -10,6 +10,7 @@ from app import db
 from sqlalchemy import or_, desc
 from app.config import Config
 from werkzeug.utils import secure_filename
+from app.utils.static_files import static_file_exists
 
 account_bp = Blueprint("account_bp", __name__, template_folder="templates")
 
@@ -20,7 +21,7 @@ def path_exists_in_static(relative_path: str) -> bool:
     if not relative_path:
         return False
     full_path = os.path.join(current_app.static_folder, relative_path)
-    return os.path.isfile(full_path)
+    return static_file_exists(full_path)
 
 @account_bp.route("/")
 @login_required
@@ -188,6 +189,7 @@ def update_photo():
         relative_url = f"uploads/profile_pics/{unique_filename}"
         current_user.profile_pic_url = relative_url
         db.session.commit()
+        static_file_exists.cache_clear() # Drop stale existence checks for profile pictures
         
         flash("Profile photo updated successfully!", "success")
         return redirect(url_for("account_bp.account"))
@@ -17,6 +17,7 @@ from markupsafe import Markup
 # Import database & models
 from app.extensions import db, login_manager, mail
 from app.models import User
+from app.utils.email_utils import is_valid_email
 
 auth_bp = Blueprint("auth_bp", __name__, template_folder="templates")
 
@@ -73,6 +74,9 @@ def register():
         if not email or not password:
             flash("Email and password are required.", "danger")
             return redirect(url_for("auth_bp.register"))
+        if not is_valid_email(email):
+            flash("Please enter a valid email address.", "danger")
+            return redirect(url_for("auth_bp.register"))
 
         # Check for existing user
         existing_user = User.query.filter_by(email=email).first()
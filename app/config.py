@@ -20,6 +20,29 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "change_me_in_env")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URI", "sqlite:///app_database.sqlite")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool tuning; pool sizing only applies to server databases (not SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_recycle": 1800, "pool_pre_ping": True}
+    if not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.environ.get("DB_POOL_SIZE", "20")),
+            max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        )
+
+    # Socket.IO packet serializer: 'default' (JSON) or 'msgpack' (smaller, faster payloads;
+    # requires the msgpack package and the socket.io.msgpack client bundle)
+    SOCKETIO_SERIALIZER = os.environ.get("SOCKETIO_SERIALIZER", "default")
+    # Optional message queue (e.g. redis://localhost:6379/0) so emits reach clients connected
+    # to any worker; requires the redis package. Presence tracking in app/sockets.py is still
+    # per-process, so multi-worker deployments also need sticky sessions.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE") or None
+
+    # When true, page queries that declare their eager loads add raiseload('*'), so any
+    # un-declared lazy load (an N+1 in a template) raises instead of silently querying
+    RAISE_ON_LAZY_LOAD = os.environ.get("RAISE_ON_LAZY_LOAD", "False").lower() == "true"
+
+    # Optional directory for Jinja's compiled template bytecode, shared across workers and restarts.
+    # Template auto-reload already follows debug mode, so production never re-checks templates on disk.
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR") or None
 
     # IBM watsonx.ai Credentials
     WATSONX_API_KEY = os.environ.get("WATSONX_API_KEY", "FLGoHlluE6PT6Ins-_jiz7CU1WzSd39v5SrtMTj8jI3K")
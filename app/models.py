@@ -1,11 +1,36 @@
 # app/models.py
 from datetime import datetime, timedelta
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from .extensions import db
 import secrets # Added for participants token
 import json # Added for whiteboard content
 
 
+# ---------------- Server-side UTC timestamp ----------------
+class utc_now(FunctionElement):
+    """Current UTC time computed by the database, matching the naive utcnow() values stored elsewhere."""
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _utc_now_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP" # SQLite's CURRENT_TIMESTAMP is already UTC
+
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)" # now() is in the session time zone
+
+
+@compiles(utc_now, "mysql")
+def _utc_now_mysql(element, compiler, **kw):
+    return "UTC_TIMESTAMP()"
+
+
 # ---------------- User Model ----------------
 class User(db.Model, UserMixin):
     __tablename__ = "users"
@@ -62,7 +87,7 @@ class Workspace(db.Model):
     is_private = db.Column(db.Boolean, default=True)
     created_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     updated_timestamp = db.Column(
-        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+        db.DateTime, default=utc_now(), onupdate=utc_now()
     )
     description = db.Column(db.Text, nullable=True)
     logo_url = db.Column(db.String(255), default="")
@@ -70,9 +95,43 @@ class Workspace(db.Model):
     # Relationships
     owner = db.relationship("User", backref=db.backref("owned_workspaces", lazy=True))
     members = db.relationship("WorkspaceMember", back_populates="workspace", cascade="all, delete-orphan", lazy='selectin')
+    # Read-only views of members split by status in SQL (for pages that list them separately)
+    active_members = db.relationship(
+        "WorkspaceMember",
+        primaryjoin="and_(Workspace.workspace_id == WorkspaceMember.workspace_id, WorkspaceMember.status == 'active')",
+        viewonly=True,
+    )
+    pending_members = db.relationship(
+        "WorkspaceMember",
+        primaryjoin="and_(Workspace.workspace_id == WorkspaceMember.workspace_id, WorkspaceMember.status != 'active')",
+        viewonly=True,
+    ) # 'invited', 'requested', etc.
     documents = db.relationship("Document", back_populates="workspace", cascade="all, delete-orphan", lazy='dynamic')
     workshops = db.relationship("Workshop", back_populates="workspace", cascade="all, delete-orphan", lazy='dynamic')
 
+    def member_by_user(self, user_id, status=None):
+        """Returns the membership of user_id (optionally only with the given status), or None."""
+        index = self.__dict__.get('_member_index')
+        if index is None:
+            # Built once per load of members; dropped whenever the instance is expired/refreshed
+            index = {m.user_id: m for m in self.members}
+            self._member_index = index
+        member = index.get(user_id)
+        if member is not None and status is not None and member.status != status:
+            return None
+        return member
+
+
+# Membership changes are committed (which expires the workspace) or refreshed; never serve a stale index
+@event.listens_for(Workspace, "expire")
+def _drop_member_index_on_expire(target, attrs):
+    target.__dict__.pop('_member_index', None)
+
+
+@event.listens_for(Workspace, "refresh")
+def _drop_member_index_on_refresh(target, context, attrs):
+    target.__dict__.pop('_member_index', None)
+
 
 # ------------- Workspace Member Model ----------------
 class WorkspaceMember(db.Model):
@@ -88,8 +147,21 @@ class WorkspaceMember(db.Model):
     user = db.relationship("User", back_populates="workspace_memberships")
     workspace = db.relationship("Workspace", back_populates="members")
 
-    # Unique constraint
-    __table_args__ = (db.UniqueConstraint('workspace_id', 'user_id', name='_workspace_user_uc'),)
+    # Unique constraint, plus a covering index for the (workspace, user, status='active') permission checks
+    __table_args__ = (
+        db.UniqueConstraint('workspace_id', 'user_id', name='_workspace_user_uc'),
+        db.Index('ix_ws_member_ws_user_status', 'workspace_id', 'user_id', 'status'),
+    )
+
+
+# Active member count as a correlated SQL COUNT (deferred; undefer it where only the count is needed)
+Workspace.active_member_count = db.column_property(
+    db.select(db.func.count(WorkspaceMember.id))
+    .where(WorkspaceMember.workspace_id == Workspace.workspace_id, WorkspaceMember.status == 'active')
+    .correlate_except(WorkspaceMember)
+    .scalar_subquery(),
+    deferred=True,
+)
 
 
 # ---------------- Member Invitation Model ----------------
@@ -229,7 +301,7 @@ class WorkshopParticipant(db.Model):
     __tablename__ = "workshop_participants"
     id = db.Column(db.Integer, primary_key=True)
     workshop_id = db.Column(db.Integer, db.ForeignKey("workshops.id"), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False, index=True) # user-only lookups (my workshops/invitations)
     role = db.Column(db.String(50), default="participant") # organizer, participant
     status = db.Column(db.String(50), default="invited") # invited, accepted, declined
     invitation_token = db.Column(db.String(64), unique=True, nullable=True) # Token for accept/decline link
@@ -248,7 +320,7 @@ class WorkshopParticipant(db.Model):
     votes_cast = db.relationship("IdeaVote", back_populates="participant", cascade="all, delete-orphan", lazy='dynamic') # Added backref
 
 
-    # Unique constraint
+    # Unique constraint (its composite index also serves workshop_id + user_id lookups)
     __table_args__ = (db.UniqueConstraint('workshop_id', 'user_id', name='_workshop_user_uc'),)
 
     # Helper function to generate and validate tokens.
@@ -294,7 +366,7 @@ class BrainstormTask(db.Model):
     # Relationship
     workshop = db.relationship("Workshop", back_populates="tasks", foreign_keys=[workshop_id]) # Explicit FK here too for clarity, matching Workshop.tasks
     ideas = db.relationship("BrainstormIdea", back_populates="task",
-                            cascade="all, delete-orphan", lazy="dynamic", order_by="BrainstormIdea.timestamp")
+                            cascade="all, delete-orphan", lazy="dynamic", order_by="[BrainstormIdea.timestamp, BrainstormIdea.id]") # id breaks same-instant ties
 
 
 
@@ -303,11 +375,11 @@ class BrainstormIdea(db.Model):
     __tablename__ = "brainstorm_ideas"
     
     id = db.Column(db.Integer, primary_key=True)
-    task_id = db.Column(db.Integer, db.ForeignKey("brainstorm_tasks.id"), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey("brainstorm_tasks.id"), nullable=False, index=True) # ideas are always fetched per task
     participant_id = db.Column(db.Integer, db.ForeignKey("workshop_participants.id"), nullable=False)
     content = db.Column(db.Text, nullable=False)
     # votes = db.relationship("IdeaVote", back_populates="idea", cascade="all, delete-orphan", lazy='dynamic')
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=utc_now()) # Stamped by the database (UTC) on insert
     
     # --- ADDED/MODIFIED FOR CLUSTERING ---
     cluster_id = db.Column(db.Integer, db.ForeignKey("idea_clusters.id"), nullable=True)
@@ -12,9 +12,10 @@ import markdown # If you plan to return HTML directly later
 
 # -----------------------------------------------------------
 # 1.b Generate workshop agenda (New Function)
-def generate_agenda_text(workshop_id):
-    """Generates a suggested workshop agenda using the LLM."""
-    pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
+def generate_agenda_text(workshop_id, pre_workshop_data=None):
+    """Generates a suggested workshop agenda using the LLM (reuses pre_workshop_data if already aggregated)."""
+    if pre_workshop_data is None:
+        pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
     if not pre_workshop_data:
         return "Could not generate agenda: Workshop data unavailable."
 
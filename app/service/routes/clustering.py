@@ -86,7 +86,7 @@ def get_clustering_voting_payload(workshop_id: int, previous_task_id: int, phase
 
     # Create indexed text for LLM
     ideas_text = "\n".join([f"{idx}: {idea.content}" for idx, idea in enumerate(ideas)])
-    idea_map = {idx: idea.id for idx, idea in enumerate(ideas)} # Map index back to idea ID
+    idea_map = dict(enumerate(ideas)) # Map index back to the idea itself
 
     raw_text, code = generate_clustering_text(workshop_id, ideas_text, phase_context)
     if code != 200:
@@ -128,12 +128,10 @@ def get_clustering_voting_payload(workshop_id: int, previous_task_id: int, phase
             # Link ideas using the map
             linked_idea_ids = []
             for idx in idea_indices:
-                if idx in idea_map:
-                    idea_id = idea_map[idx]
-                    idea = next((i for i in ideas if i.id == idea_id), None)
-                    if idea:
-                        idea.cluster_id = cluster.id
-                        linked_idea_ids.append(idea.id)
+                idea = idea_map.get(idx)
+                if idea:
+                    idea.cluster_id = cluster.id
+                    linked_idea_ids.append(idea.id)
 
             processed_clusters.append({
                 "id": cluster.id, # Use DB ID
@@ -76,8 +76,9 @@ Respond with *only* the valid JSON object, nothing else.
 def get_feasibility_payload(workshop_id: int, previous_task_id: int, phase_context: str):
     """Fetches top clusters, generates report, creates DB record, returns payload."""
     # Get clusters from the previous task, ordered by vote count descending
+    # Only the name is used, so skip hydrating full IdeaCluster rows
     top_clusters = db.session.query(
-            IdeaCluster, func.count(IdeaVote.id).label('vote_count')
+            IdeaCluster.name, func.count(IdeaVote.id).label('vote_count')
         ).join(IdeaVote, IdeaCluster.id == IdeaVote.cluster_id, isouter=True)\
         .filter(IdeaCluster.task_id == previous_task_id)\
         .group_by(IdeaCluster.id)\
@@ -87,7 +88,7 @@ def get_feasibility_payload(workshop_id: int, previous_task_id: int, phase_conte
     if not top_clusters:
         return "No voted clusters found from the previous task.", 400
 
-    clusters_summary = "\n".join([f"- {cluster.name} (Votes: {count})" for cluster, count in top_clusters])
+    clusters_summary = "\n".join([f"- {name} (Votes: {count})" for name, count in top_clusters])
 
     raw_text, code = generate_feasibility_text(workshop_id, clusters_summary, phase_context)
     if code != 200: return raw_text, code
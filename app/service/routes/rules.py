@@ -14,9 +14,10 @@ from app.utils.data_aggregation import aggregate_pre_workshop_data
 # # 2.b Generate rules and guidelines
 @agent_bp.route("/generate_rules_text/<int:workshop_id>", methods=["POST"])
 @login_required
-def generate_rules_text(workshop_id):
-    """ Service Generates suggested workshop rules using the LLM."""
-    pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
+def generate_rules_text(workshop_id, pre_workshop_data=None):
+    """ Service Generates suggested workshop rules using the LLM (reuses pre_workshop_data if already aggregated)."""
+    if pre_workshop_data is None:
+        pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
     if not pre_workshop_data:
         # Return a meaningful message or error response
         return jsonify({"error": f"Could not generate rules: Workshop data unavailable."}), 404
@@ -13,9 +13,10 @@ import markdown # If you plan to return HTML directly later
 # #-----------------------------------------------------------
 # # 2.d Generate tips for participants
 
-def generate_tip_text(workshop_id):
-    """Generates only the tip text using the LLM."""
-    pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
+def generate_tip_text(workshop_id, pre_workshop_data=None):
+    """Generates only the tip text using the LLM (reuses pre_workshop_data if already aggregated)."""
+    if pre_workshop_data is None:
+        pre_workshop_data = aggregate_pre_workshop_data(workshop_id)
     if not pre_workshop_data:
         return "No pre‑workshop data found."
     
@@ -5,8 +5,9 @@ All real‑time events (presence, chat, ideas, lifecycle) are registered here.
 Importing this module is enough to register the handlers.
 """
 import json
+import threading
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime # Ensure datetime is imported
 
 from flask import current_app, request
@@ -31,6 +32,59 @@ from app.service.routes.moderator import initialize_participant_tracking, cleanu
 _sid_registry: Dict[str, Dict] = {}
 # room ➜ set(user_id)
 _room_presence: Dict[str, set] = defaultdict(set)
+# (workshop_id, user_id) ➜ set(sid); secondary index over _sid_registry
+_user_room_to_sids: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+# workshop_id ➜ {user_id: participant payload}; display info for online users, so
+# presence broadcasts only hit the DB for users who just joined
+_participant_info_cache: Dict[int, Dict[int, dict]] = {}
+# Guards _sid_registry and _user_room_to_sids so they never drift apart
+_registry_lock = threading.Lock()
+
+
+def _register_sid(sid: str, room: str, workshop_id: int, user_id: int) -> None:
+    """Record a SID in the registry and the (workshop, user) index."""
+    with _registry_lock:
+        _sid_registry[sid] = {
+            "room": room,
+            "workshop_id": workshop_id,
+            "user_id": user_id,
+        }
+        _user_room_to_sids[(workshop_id, user_id)].add(sid)
+
+
+def _unregister_sid(sid: str) -> Optional[Dict]:
+    """Remove a single SID from both structures; returns its info, if any."""
+    with _registry_lock:
+        info = _sid_registry.pop(sid, None)
+        if info:
+            key = (info["workshop_id"], info["user_id"])
+            sids = _user_room_to_sids.get(key)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del _user_room_to_sids[key]
+        return info
+
+
+def _evict_user_from_room(room: str, workshop_id: int, user_id: int) -> Optional[int]:
+    """
+    Drop every SID a user holds in a workshop and their presence in room, in one
+    locked step. Returns how many users remain in the room (the empty room entry is
+    removed), or None if the user had no registered SIDs.
+    """
+    with _registry_lock:
+        sids = _user_room_to_sids.pop((workshop_id, user_id), None)
+        if not sids:
+            return None
+        for sid in sids:
+            _sid_registry.pop(sid, None)
+        present = _room_presence.get(room)
+        if present is None:
+            return 0
+        present.discard(user_id)
+        if not present:
+            del _room_presence[room]
+        return len(present)
 
 
 # ---------------------------------------------------------------------------
@@ -38,32 +92,32 @@ _room_presence: Dict[str, set] = defaultdict(set)
 # ---------------------------------------------------------------------------
 def _get_participant_payload(workshop_id: int) -> List[dict]:
     """Return minimal participant info for the given workshop_id."""
-    workshop = Workshop.query.get(workshop_id)
-    if not workshop:
-        return []
-
-    online_ids = {
-        info["user_id"]
-        for info in _sid_registry.values()
-        if info.get("workshop_id") == workshop_id
-    }
+    online_ids = {uid for (wid, uid) in list(_user_room_to_sids) if wid == workshop_id}
     if not online_ids:
+        _participant_info_cache.pop(workshop_id, None)
         return []
 
-    users = User.query.filter(User.user_id.in_(online_ids)).all()
-    payload = []
-    for u in users:
-        payload.append(
-            {
+    cached = _participant_info_cache.setdefault(workshop_id, {})
+    # Forget users who have left since the last broadcast; they're re-read if they rejoin
+    for uid in set(cached) - online_ids:
+        del cached[uid]
+
+    missing_ids = online_ids - cached.keys()
+    if missing_ids:
+        organizer_id = db.session.query(Workshop.created_by_id).filter_by(id=workshop_id).scalar()
+        if organizer_id is None:
+            return []
+        users = User.query.filter(User.user_id.in_(missing_ids)).all()
+        for u in users:
+            cached[u.user_id] = {
                 "user_id": u.user_id,
                 "first_name": u.first_name or "",
                 "last_name": u.last_name or "", # Added last_name
                 "profile_pic_url": getattr(u, "profile_pic_url", None), # Pass actual URL or None
-                "is_organizer": u.user_id == workshop.created_by_id,
+                "is_organizer": u.user_id == organizer_id,
                 "email": u.email,
             }
-        )
-    return payload
+    return list(cached.values())
 
 
 def _broadcast_participant_list(room: str, workshop_id: int):
@@ -213,7 +267,7 @@ def _on_connect():
 
 @socketio.on("disconnect")
 def _on_disconnect():
-    info = _sid_registry.pop(request.sid, None)
+    info = _unregister_sid(request.sid)
     if info:
         room, workshop_id, user_id = info["room"], info["workshop_id"], info["user_id"]
         # Check if room still exists in presence tracking before discarding
@@ -251,14 +305,10 @@ def _on_join_room(data):
         return
 
     # --- Prevent duplicate joins for the same user/workshop in registry ---
-    existing_sid = None
-    for s, info in list(_sid_registry.items()): # Iterate over a copy
-        if info.get("workshop_id") == workshop_id and info.get("user_id") == user_id:
-            existing_sid = s
-            break
+    existing_sid = next(iter(_user_room_to_sids.get((workshop_id, user_id), ())), None)
     if existing_sid and existing_sid != sid:
         current_app.logger.warning(f"User {user_id} already in room {room} with SID {existing_sid}. Removing old entry.")
-        _sid_registry.pop(existing_sid, None) # Remove old entry
+        _unregister_sid(existing_sid) # Remove old entry
         if room in _room_presence:
             _room_presence[room].discard(user_id) # Ensure presence count is correct
 
@@ -266,11 +316,7 @@ def _on_join_room(data):
     
     # --- Join and Register ---
     join_room(room)
-    _sid_registry[sid] = {
-        "room": room,
-        "workshop_id": workshop_id,
-        "user_id": user_id,
-    }
+    _register_sid(sid, room, workshop_id, user_id)
     # Ensure the room exists in _room_presence before adding
     if room not in _room_presence:
         _room_presence[room] = set()
@@ -357,7 +403,7 @@ def _on_join_room(data):
                 # Emit ideas for brainstorming/warmup
                 ideas = BrainstormIdea.query.options(
                     selectinload(BrainstormIdea.participant).selectinload(WorkshopParticipant.user)
-                ).filter_by(task_id=task.id).order_by(BrainstormIdea.timestamp).all()
+                ).filter_by(task_id=task.id).order_by(BrainstormIdea.timestamp, BrainstormIdea.id).all()
                 ideas_payload = [{
                     "idea_id": idea.id,
                     "user": idea.participant.user.first_name or idea.participant.user.email.split('@')[0] if idea.participant and idea.participant.user else "Unknown",
@@ -422,8 +468,7 @@ def _on_leave_room(data):
     if room in _room_presence: # Check if room exists before discarding
         _room_presence[room].discard(user_id)
     # Remove the specific SID that emitted leave_room
-    if sid in _sid_registry:
-        _sid_registry.pop(sid)
+    if _unregister_sid(sid):
         # --- ADDED: Cleanup Moderator Tracking ---
         if workshop_id and user_id:
             cleanup_participant_tracking(workshop_id, user_id)
@@ -0,0 +1,14 @@
+# app/utils/email_utils.py
+import re
+
+# Same rule browsers apply to <input type="email"> (WHATWG HTML spec), which the
+# registration and invitation forms already rely on client-side
+EMAIL_PATTERN = re.compile(
+    r"^[a-zA-Z0-9.!#$%&'*+/=?^_`{|}~-]+@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?"
+    r"(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*$"
+)
+
+
+def is_valid_email(email: str) -> bool:
+    """Returns True if email is a syntactically valid address."""
+    return bool(email) and len(email) <= 255 and EMAIL_PATTERN.match(email) is not None
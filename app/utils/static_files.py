@@ -0,0 +1,24 @@
+# app/utils/static_files.py
+import os
+from functools import lru_cache
+from flask import current_app
+
+DEFAULT_PROFILE_PIC = "images/default-profile.png"
+
+
+@lru_cache(maxsize=4096)
+def static_file_exists(full_path: str) -> bool:
+    """
+    Cached os.path.isfile for files under the static folder (e.g. profile pictures),
+    which rarely move. Call static_file_exists.cache_clear() after uploading a file.
+    """
+    return os.path.isfile(full_path)
+
+
+def profile_pic_display_path(relative_path: str) -> str:
+    """Returns relative_path if it names an existing static file, else the default profile picture."""
+    if relative_path:
+        relative_path = relative_path.lstrip('/')
+        if static_file_exists(os.path.join(current_app.static_folder, relative_path)):
+            return relative_path
+    return DEFAULT_PROFILE_PIC
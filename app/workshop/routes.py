@@ -1,5 +1,5 @@
 # app/workshop/routes.py
-import os, markdown, json, re
+import os, markdown, json, re, time, threading, copy
 from flask import (
     Blueprint,
     render_template,
@@ -10,11 +10,13 @@ from flask import (
     current_app,
     abort,
     jsonify,
+    g,
 )  
 from markupsafe import escape
 from flask_login import login_required, current_user
 import markdown # Import markdown
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 # --- Socket.IO Room Join/Leave Handlers ---
 from flask_socketio import join_room, leave_room
@@ -24,7 +26,7 @@ from app.extensions import socketio
 from app.service.routes.task import get_next_task_payload
 
 
-from sqlalchemy.orm import joinedload, selectinload, subqueryload # <--- Add subqueryload
+from sqlalchemy.orm import joinedload, selectinload, subqueryload, defer # <--- Add subqueryload
 from sqlalchemy.exc import IntegrityError
 
 @socketio.on('join_room')
@@ -67,7 +69,7 @@ from app.models import (
 from datetime import datetime, timedelta
 from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_
+from sqlalchemy import or_, update, select, bindparam, text
 from app.auth.routes import send_email  # TODO: Move send_email from auth to a extension module
 from datetime import datetime  # Import datetime
 
@@ -78,6 +80,7 @@ from app.service.routes.tip import generate_tip_text # Assuming this exists
 
 # Import aggregate_pre_workshop_data from the new utils file ---
 from app.utils.data_aggregation import aggregate_pre_workshop_data
+from app.utils.static_files import profile_pic_display_path
 # Import extract_json_block
 from app.service.routes.agent import extract_json_block 
 
@@ -110,7 +113,7 @@ from app.sockets import (
     emit_workshop_stopped,
     
     # Import helpers needed for beacon_leave simulation if defined in sockets.py
-    _sid_registry,
+    _evict_user_from_room,
     _room_presence,
     _broadcast_participant_list
 )
@@ -181,6 +184,113 @@ def is_organizer(workshop, user):
     return workshop.created_by_id == user.user_id
 
 
+# --- Organizer check that never loads the full Workshop row ---
+def is_organizer_cheap(workshop_id, user_id):
+    """Selects only created_by_id (404 if the workshop is missing); memoized on g for the request."""
+    cache = g.setdefault('_is_org', {})
+    key = (workshop_id, user_id)
+    if key not in cache:
+        owner_id = db.session.query(Workshop.created_by_id).filter_by(id=workshop_id).scalar()
+        if owner_id is None:
+            abort(404)
+        cache[key] = owner_id == user_id
+    return cache[key]
+
+
+# Loader options skipping the large AI markdown columns (only the lobby renders them)
+DEFER_LOBBY_TEXT = (
+    defer(Workshop.rules),
+    defer(Workshop.icebreaker),
+    defer(Workshop.tip),
+) # The lobby's agenda template still reads workshop.agenda
+DEFER_AI_CONTENT = DEFER_LOBBY_TEXT + (defer(Workshop.agenda),)
+
+
+# --- Helper to load a workshop once per request ---
+def get_workshop_cached(workshop_id, *options):
+    """Returns the Workshop for workshop_id, querying at most once per request."""
+    workshops = g.setdefault('_workshops', {})
+    workshop = workshops.get(workshop_id)
+    if workshop is None:
+        workshop = Workshop.query.options(*options).get_or_404(workshop_id)
+        workshops[workshop_id] = workshop
+    return workshop
+
+
+# --- Lightweight workshop read for permission/state checks ---
+def get_workshop_summary(workshop_id):
+    """
+    Returns a row with only the columns the task-flow checks need (id, created_by_id,
+    status, current_task_id, current_task_index, task_sequence, updated_at); 404 if missing.
+    Load the ORM Workshop only once it is about to be mutated.
+    """
+    summary = db.session.query(
+        Workshop.id,
+        Workshop.created_by_id,
+        Workshop.status,
+        Workshop.current_task_id,
+        Workshop.current_task_index,
+        Workshop.task_sequence,
+        Workshop.updated_at,
+    ).filter_by(id=workshop_id).one_or_none()
+    if summary is None:
+        abort(404)
+    return summary
+
+
+# --- Relaxed durability for task-start transactions ---
+def relax_commit_durability():
+    """
+    On PostgreSQL, lets the current transaction commit without waiting for the WAL
+    flush (SET LOCAL synchronous_commit TO OFF). Only for task-start writes: a crash
+    may lose the last few hundred ms of them, and clients resync task/timer state on
+    rejoin. No-op on other databases.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("SET LOCAL synchronous_commit TO OFF"))
+
+
+# --- Helper to parse a workshop's stored action plan ---
+@lru_cache(maxsize=256)
+def parse_action_plan(action_plan_json):
+    """Parses Workshop.task_sequence JSON, memoized on the raw string. Treat the result as read-only."""
+    return json.loads(action_plan_json)
+
+
+# --- Participant lookups, built once at import ---
+# Bound-parameter select()s hit SQLAlchemy's compiled cache, skipping per-call Query construction.
+_participant_filter = (
+    WorkshopParticipant.workshop_id == bindparam("workshop_id"),
+    WorkshopParticipant.user_id == bindparam("user_id"),
+)
+_PARTICIPANT_SELECT = select(WorkshopParticipant).where(*_participant_filter)
+_PARTICIPANT_ID_SELECT = select(WorkshopParticipant.id).where(*_participant_filter)
+
+
+# --- Helper to look up the user's participant record once per request ---
+def get_participant_cached(workshop_id, user_id):
+    """Returns the WorkshopParticipant for (workshop_id, user_id) or None, memoized on g."""
+    participants = g.setdefault('_participants', {})
+    key = (workshop_id, user_id)
+    if key not in participants:
+        participants[key] = db.session.execute(
+            _PARTICIPANT_SELECT, {"workshop_id": workshop_id, "user_id": user_id}
+        ).scalars().first()
+    return participants[key]
+
+
+# --- Helper for membership checks that only need the participant id ---
+def get_participant_id_cached(workshop_id, user_id):
+    """Returns the WorkshopParticipant id for (workshop_id, user_id) or None, memoized on g."""
+    participant_ids = g.setdefault('_participant_ids', {})
+    key = (workshop_id, user_id)
+    if key not in participant_ids:
+        participant_ids[key] = db.session.execute(
+            _PARTICIPANT_ID_SELECT, {"workshop_id": workshop_id, "user_id": user_id}
+        ).scalar()
+    return participant_ids[key]
+
+
 # --- Helper to get user's workspaces ---
 def get_user_active_workspaces(user_id):
     """Returns a list of Workspace objects the user is an active member of."""
@@ -240,9 +350,7 @@ def get_user_active_documents(user_id):
 def get_raw_action_plan(workshop_id):
     # Basic permission check: Ensure user can view the workshop
     workshop = Workshop.query.get_or_404(workshop_id)
-    participant = WorkshopParticipant.query.filter_by(
-        workshop_id=workshop.id, user_id=current_user.user_id
-    ).first()
+    participant = get_participant_cached(workshop.id, current_user.user_id)
     if not participant:
          # Or check workspace membership if that's the rule
         return jsonify({"success": False, "message": "Permission denied"}), 403
@@ -828,6 +936,7 @@ def remove_participant(workshop_id, participant_id):
 @workshop_bp.route("/invitation/<token>", methods=["GET"])
 @login_required  # User must be logged in to respond
 def respond_invitation(token):
+    now = datetime.utcnow()
     participant_record = WorkshopParticipant.query.filter_by(
         invitation_token=token
     ).first()
@@ -846,7 +955,7 @@ def respond_invitation(token):
 
     if action == "accept":
         participant_record.status = "accepted"
-        participant_record.joined_timestamp = datetime.utcnow()
+        participant_record.joined_timestamp = now
         participant_record.invitation_token = None  # Invalidate token
         participant_record.token_expires = None
         db.session.commit()
@@ -880,7 +989,12 @@ def respond_invitation(token):
 @workshop_bp.route("/<int:workshop_id>/add_document", methods=["POST"])
 @login_required
 def add_document_link(workshop_id):
-    workshop = Workshop.query.get_or_404(workshop_id)
+    # Only the organizer and the workspace are needed: select both columns in one query
+    workshop = db.session.query(
+        Workshop.created_by_id, Workshop.workspace_id
+    ).filter_by(id=workshop_id).one_or_none()
+    if workshop is None:
+        abort(404)
 
     # --- Permission Check: Only Organizer ---
     if not is_organizer(workshop, current_user):
@@ -904,28 +1018,22 @@ def add_document_link(workshop_id):
         )
         return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
 
-    # Check if already linked
-    existing_link = WorkshopDocument.query.filter_by(
-        workshop_id=workshop_id, document_id=document_id_to_add
-    ).first()
-    if existing_link:
-        flash(
-            f"Document '{document_to_add.title}' is already linked to this workshop.",
-            "warning",
-        )
-        return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
-
+    # Insert optimistically; the (workshop_id, document_id) unique constraint rejects duplicates
+    doc_title = document_to_add.title
     try:
         new_link = WorkshopDocument(
             workshop_id=workshop_id, document_id=document_id_to_add
         )
         db.session.add(new_link)
         db.session.commit()
-        flash(f"Document '{document_to_add.title}' linked successfully.", "success")
+        flash(f"Document '{doc_title}' linked successfully.", "success")
 
     except IntegrityError:
         db.session.rollback()
-        flash("Could not link document due to a database conflict.", "warning")
+        flash(
+            f"Document '{doc_title}' is already linked to this workshop.",
+            "warning",
+        )
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(
@@ -940,11 +1048,17 @@ def add_document_link(workshop_id):
 @workshop_bp.route("/<int:workshop_id>/remove_document/<int:link_id>", methods=["POST"])
 @login_required
 def remove_document_link(workshop_id, link_id):
-    workshop = Workshop.query.get_or_404(workshop_id)
-    link_to_remove = WorkshopDocument.query.get_or_404(link_id)
+    # Load the link and just the document title it needs in one JOINed SELECT
+    link_to_remove = (
+        WorkshopDocument.query.options(
+            joinedload(WorkshopDocument.document).load_only(Document.title)
+        )
+        .filter_by(id=link_id)
+        .first_or_404()
+    )
 
     # --- Permission Check: Only Organizer ---
-    if not is_organizer(workshop, current_user):
+    if not is_organizer_cheap(workshop_id, current_user.user_id):
         flash("Only the workshop organizer can remove documents.", "danger")
         return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
 
@@ -972,6 +1086,16 @@ def remove_document_link(workshop_id, link_id):
 # ################################
 
 
+# Workshop status -> (endpoint, flash message, flash category) for join_workshop
+_JOIN_DISPATCH = {
+    "scheduled": ("workshop_bp.workshop_lobby", None, None),
+    "inprogress": ("workshop_bp.workshop_room", None, None),
+    "paused": ("workshop_bp.workshop_room", None, None),
+    "completed": ("workshop_bp.workshop_report", "This workshop has already been completed.", "info"),
+    "cancelled": ("workshop_bp.view_workshop", "This workshop has been cancelled.", "warning"),
+}
+
+
 @workshop_bp.route("/join/<int:workshop_id>")
 @login_required
 def join_workshop(workshop_id):
@@ -979,10 +1103,8 @@ def join_workshop(workshop_id):
     Handles a user clicking the 'Join' button.
     Redirects to lobby if not started, room if in progress.
     """
-    workshop = Workshop.query.get_or_404(workshop_id)
-    participant = WorkshopParticipant.query.filter_by(
-        workshop_id=workshop.id, user_id=current_user.user_id
-    ).first()
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
+    participant = get_participant_cached(workshop.id, current_user.user_id)
 
     # Basic permission check: Must be a participant (invited or accepted)
     if not participant:
@@ -1000,25 +1122,8 @@ def join_workshop(workshop_id):
         )
 
     # Redirect based on status
-    if workshop.status == "scheduled":
-        # Mark participant status if needed (e.g., 'joined_lobby') - Optional
-        # participant.status = 'joined_lobby' # Example
-        # db.session.commit()
-        return redirect(url_for("workshop_bp.workshop_lobby", workshop_id=workshop_id))
-    elif workshop.status == "inprogress":
-        # Mark participant status if needed (e.g., 'in_room') - Optional
-        # participant.status = 'in_room' # Example
-        # db.session.commit()
-        return redirect(url_for("workshop_bp.workshop_room", workshop_id=workshop_id))
-    elif workshop.status == "completed":
-        flash("This workshop has already been completed.", "info")
-        return redirect(url_for("workshop_bp.workshop_report", workshop_id=workshop_id))
-    elif workshop.status == "cancelled":
-        flash("This workshop has been cancelled.", "warning")
-        return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
-    elif workshop.status == "paused":
-        return redirect(url_for("workshop_bp.workshop_room", workshop_id=workshop_id))
-    else:
+    target = _JOIN_DISPATCH.get(workshop.status)
+    if target is None:
         # Handle other statuses if necessary
         flash(
             f"Workshop is currently in status: {workshop.status}. Cannot join at this time.",
@@ -1026,126 +1131,128 @@ def join_workshop(workshop_id):
         )
         return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
 
+    endpoint, message, category = target
+    if message:
+        flash(message, category)
+    return redirect(url_for(endpoint, workshop_id=workshop_id))
 
 
 
 
 
 
-@workshop_bp.route("/lobby/<int:workshop_id>")
-@login_required
-def workshop_lobby(workshop_id):
-    """Displays the waiting lobby for a scheduled workshop with AI content slots."""
-    # Load workshop with eager relationships
-    workshop = Workshop.query.options(
-        joinedload(Workshop.creator),
-        joinedload(Workshop.workspace),
-    ).get_or_404(workshop_id)
-    
-    # Now load participants (with their User) via a normal query:
-    participants = WorkshopParticipant.query.options(
-        joinedload(WorkshopParticipant.user)
-    ).filter_by(workshop_id=workshop.id).all()
-    
-# Add profile picture URL to each participant
-    for participant in participants:
-        participant.profile_pic_url = url_for('static', filename='images/default-profile.png')
 
-    # And load linked documents (with their Document) explicitly:
-    linked_docs = WorkshopDocument.query.options(
-        joinedload(WorkshopDocument.document)
-    ).filter_by(workshop_id=workshop.id).all()
+# --- In-memory cache of rendered lobby AI content ---
+# { workshop_id: (updated_at, expires_at, {agenda, rules, icebreaker, tip}) }
+_lobby_content_cache = {}
+LOBBY_CACHE_TTL_SECONDS = 600
 
-    # Check if the user is a participant using the preloaded data
-    participant = next((p for p in workshop.participants if p.user_id == current_user.user_id), None)
 
-    # Permission checks
-    if not participant:
-        flash("You are not a participant in this workshop.", "danger")
-        return redirect(url_for("workshop_bp.list_workshops"))
-    
+def _get_cached_lobby_content(workshop):
+    """Returns the cached lobby HTML if it matches the workshop's updated_at and is fresh."""
+    entry = _lobby_content_cache.get(workshop.id)
+    if entry and entry[0] == workshop.updated_at and entry[1] > time.monotonic():
+        return entry[2]
+    return None
 
-    # Status checks and redirects
-    if workshop.status == "inprogress":
-        flash("Workshop already in progress. Joining room...", "info")
-        return redirect(url_for("workshop_bp.workshop_room", workshop_id=workshop_id))
-    elif workshop.status == "completed":
-        flash("Workshop completed. Viewing report...", "info")
-        return redirect(url_for("workshop_bp.workshop_report", workshop_id=workshop_id))
-    elif workshop.status != "scheduled":
-        flash(f"Workshop status is '{workshop.status}'. Cannot access lobby.", "warning")
-        return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
 
-    # --- AI Content: Load or Generate ---
-    save_needed = False
-    ai_rules_raw = None
-    ai_icebreaker_raw = None
-    ai_tip_raw = None
-    ai_agenda_raw = None 
+def _set_cached_lobby_content(workshop, ai_content):
+    now = time.monotonic()
+    # Drop expired entries so the cache doesn't grow with every workshop ever viewed
+    for expired_id in [k for k, entry in _lobby_content_cache.items() if entry[1] <= now]:
+        _lobby_content_cache.pop(expired_id, None)
+    _lobby_content_cache[workshop.id] = (
+        workshop.updated_at,
+        now + LOBBY_CACHE_TTL_SECONDS,
+        ai_content,
+    )
+
+
+def _build_lobby_ai_content(workshop):
+    """
+    Loads (or generates and saves) the lobby AI content for a workshop and
+    returns (ai_content rendered to HTML, released). Caches the result once all four fields exist.
+    released is True when the session was committed before generating, which expires
+    every loaded object; the caller should load what it renders afterwards.
+    """
+    # The lobby query defers these text columns; load them together only on a cache miss
+    db.session.refresh(workshop, attribute_names=["rules", "icebreaker", "tip"])
+
+    # Work from local copies so nothing below touches (and re-SELECTs) the expired workshop
+    workshop_id = workshop.id
+    ai_agenda_raw = workshop.agenda
+    ai_rules_raw = workshop.rules
+    ai_icebreaker_raw = workshop.icebreaker
+    ai_tip_raw = workshop.tip
+
+    released = not (ai_agenda_raw and ai_rules_raw and ai_icebreaker_raw and ai_tip_raw)
+    pre_workshop_data = None
+    if released:
+        # Aggregate the prompt context once, up front, then end the read transaction so
+        # no pooled connection is held while the generators wait on the LLM
+        pre_workshop_data = aggregate_pre_workshop_data(workshop_id) or "" # "" -> generators' fallback text
+        db.session.commit()
+
+    updates = {} # Newly generated fields, written in one UPDATE below
 
     # Agenda (Load or Generate)
-    if workshop.agenda: # Check the existing agenda field first
-        ai_agenda_raw = workshop.agenda
+    if ai_agenda_raw: # Check the existing agenda field first
         current_app.logger.debug(f"Loaded agenda from DB for workshop {workshop_id}")
     else:
         current_app.logger.debug(f"Generating agenda for workshop {workshop_id}")
-        ai_agenda_raw = generate_agenda_text(workshop_id) # Generate if missing
+        ai_agenda_raw = generate_agenda_text(workshop_id, pre_workshop_data) # Generate if missing
         if ai_agenda_raw and not ai_agenda_raw.startswith("Could not generate"):
-            workshop.agenda = ai_agenda_raw # Save to the standard agenda field
-            save_needed = True
+            updates['agenda'] = ai_agenda_raw # Save to the standard agenda field
         else:
             ai_agenda_raw = "Could not generate an agenda at this time." # Fallback
             current_app.logger.warning(f"Failed to generate agenda for workshop {workshop_id}")
 
 
     # Rules
-    if workshop.rules:
-        ai_rules_raw = workshop.rules
+    if ai_rules_raw:
         current_app.logger.debug(f"Loaded rules from DB for workshop {workshop_id}")
     else:
         current_app.logger.debug(f"Generating rules for workshop {workshop_id}")
-        ai_rules_raw = generate_rules_text(workshop_id) # Generate if missing
+        ai_rules_raw = generate_rules_text(workshop_id, pre_workshop_data) # Generate if missing
         # Basic check for generation success (adjust if your function returns specific errors)
         if ai_rules_raw and not ai_rules_raw.startswith("Could not generate"):
-            workshop.rules = ai_rules_raw
-            save_needed = True
+            updates['rules'] = ai_rules_raw
         else:
              ai_rules_raw = "Could not generate rules at this time." # Provide fallback text
              current_app.logger.warning(f"Failed to generate rules for workshop {workshop_id}")
 
     # Icebreaker
-    if workshop.icebreaker:
-        ai_icebreaker_raw = workshop.icebreaker
+    if ai_icebreaker_raw:
         current_app.logger.debug(f"Loaded icebreaker from DB for workshop {workshop_id}")
     else:
         current_app.logger.debug(f"Generating icebreaker for workshop {workshop_id}")
-        ai_icebreaker_raw = generate_icebreaker_text(workshop_id) # Generate if missing
+        ai_icebreaker_raw = generate_icebreaker_text(workshop_id, pre_workshop_data) # Generate if missing
         if ai_icebreaker_raw and not ai_icebreaker_raw.startswith("Could not generate"):
-            workshop.icebreaker = ai_icebreaker_raw
-            save_needed = True
+            updates['icebreaker'] = ai_icebreaker_raw
         else:
             ai_icebreaker_raw = "Could not generate an icebreaker." # Fallback
             current_app.logger.warning(f"Failed to generate icebreaker for workshop {workshop_id}")
 
     # Tip (load or generate)
-    if workshop.tip:
-        ai_tip_raw = workshop.tip
+    if ai_tip_raw:
         current_app.logger.debug(f"Loaded tip from DB for workshop {workshop_id}")
     else:
         current_app.logger.debug(f"Generating tip for workshop {workshop_id}")
         
         # Adjust check based on actual error/fallback message from generate_tip_text
-        ai_tip_raw = generate_tip_text(workshop_id)
+        ai_tip_raw = generate_tip_text(workshop_id, pre_workshop_data)
         if ai_tip_raw and not ai_tip_raw.startswith("No pre‑workshop data found") and not ai_tip_raw.startswith("Could not generate"):
-            workshop.tip = ai_tip_raw
-            save_needed = True
+            updates['tip'] = ai_tip_raw
         else:
             ai_tip_raw = "Could not generate a tip." # Fallback
             current_app.logger.warning(f"Failed to generate tip for workshop {workshop_id}")
 
     # Save to DB if any content was newly generated
-    if save_needed:
+    if updates:
         try:
+            db.session.execute(
+                update(Workshop).where(Workshop.id == workshop_id).values(**updates)
+            )
             db.session.commit()
             current_app.logger.info(f"Saved newly generated AI content for workshop {workshop_id}")
         except Exception as e:
@@ -1161,21 +1268,74 @@ def workshop_lobby(workshop_id):
     ai_icebreaker_html = markdown.markdown(ai_icebreaker_raw or "No icebreaker available.")
     ai_tip_html = markdown.markdown(ai_tip_raw or "No tip available.")
 
+    ai_content = {
+        'agenda': ai_agenda_html,
+        'rules': ai_rules_html,
+        'icebreaker': ai_icebreaker_html,
+        'tip': ai_tip_html,
+    }
+    if not released: # All four fields came from the DB; workshop.updated_at is still current
+        _set_cached_lobby_content(workshop, ai_content)
+    return ai_content, released
 
-    # Get participants list for display
-    participants = WorkshopParticipant.query.options(
-        joinedload(WorkshopParticipant.user) # Eager load user details for participants
-        ).filter_by(workshop_id=workshop.id).all()
 
-    # Add profile picture URL to each participant
-    for participant in participants:
-        participant.profile_pic_url = url_for('static', filename='images/default-profile.png')
-        
-    # Get linked documents (already loaded via joinedload on workshop query)
-    linked_docs = workshop.linked_documents # Access the preloaded relationship
+def _load_lobby_workshop(workshop_id):
+    """Loads the workshop with what the lobby renders; rules/icebreaker/tip are only read on a render-cache miss."""
+    return Workshop.query.options(
+        joinedload(Workshop.creator),
+        joinedload(Workshop.workspace),
+        *DEFER_LOBBY_TEXT,
+    ).filter_by(id=workshop_id).first_or_404()
+
+
+@workshop_bp.route("/lobby/<int:workshop_id>")
+@login_required
+def workshop_lobby(workshop_id):
+    """Displays the waiting lobby for a scheduled workshop with AI content slots."""
+    user_id = current_user.user_id
+    workshop = _load_lobby_workshop(workshop_id)
+
+    # Permission checks (participant rows are loaded for rendering further down)
+    if not get_participant_id_cached(workshop_id, user_id):
+        flash("You are not a participant in this workshop.", "danger")
+        return redirect(url_for("workshop_bp.list_workshops"))
     
+
+    # Status checks and redirects
+    if workshop.status == "inprogress":
+        flash("Workshop already in progress. Joining room...", "info")
+        return redirect(url_for("workshop_bp.workshop_room", workshop_id=workshop_id))
+    elif workshop.status == "completed":
+        flash("Workshop completed. Viewing report...", "info")
+        return redirect(url_for("workshop_bp.workshop_report", workshop_id=workshop_id))
+    elif workshop.status != "scheduled":
+        flash(f"Workshop status is '{workshop.status}'. Cannot access lobby.", "warning")
+        return redirect(url_for("workshop_bp.view_workshop", workshop_id=workshop_id))
+
+    # --- AI Content: Serve cached render or Load/Generate ---
+    ai_content = _get_cached_lobby_content(workshop)
+    if ai_content is None:
+        ai_content, released = _build_lobby_ai_content(workshop)
+        if released:
+            # The pre-generation commit expired the workshop; reload it in one query
+            workshop = _load_lobby_workshop(workshop_id)
+
+    # Participants and linked documents are dynamic relationships, so they can't be
+    # eager-loaded off the workshop; load each in its own query (O(P + D) rows, no
+    # cartesian product). Loaded after any generation so they are never expired.
+    participants = WorkshopParticipant.query.options(
+        joinedload(WorkshopParticipant.user)
+    ).filter_by(workshop_id=workshop_id).all()
+    participant = next((p for p in participants if p.user_id == user_id), None)
+    # Fall back to the default picture when an uploaded one is missing on disk
+    participant_pics = {p.user_id: profile_pic_display_path(p.user.profile_pic_url) for p in participants}
+
+    linked_docs = WorkshopDocument.query.options(
+        joinedload(WorkshopDocument.document)
+    ).filter_by(workshop_id=workshop_id).all()
+
     # Check if current user is the organizer
-    is_organizer_flag = workshop.created_by_id == current_user.user_id
+    is_organizer_flag = workshop.created_by_id == user_id
     
 
     # Debugging print statement (optional)
@@ -1185,12 +1345,13 @@ def workshop_lobby(workshop_id):
         "workshop_lobby.html",
         workshop=workshop,
         participants=participants,
+        participant_pics=participant_pics,
         current_participant=participant,
         linked_documents=linked_docs,
-        ai_agenda=ai_agenda_html,
-        ai_rules=ai_rules_html,
-        ai_icebreaker=ai_icebreaker_html,
-        ai_tip=ai_tip_html,
+        ai_agenda=ai_content['agenda'],
+        ai_rules=ai_content['rules'],
+        ai_icebreaker=ai_content['icebreaker'],
+        ai_tip=ai_content['tip'],
         user_is_organizer=is_organizer_flag,
     )
     
@@ -1218,194 +1379,76 @@ def workshop_lobby(workshop_id):
 
 # Helper function for permission check
 def check_organizer_permission(workshop_id):
-    workshop = Workshop.query.get_or_404(workshop_id)
-    if workshop.created_by_id != current_user.user_id:
+    workshop = get_workshop_cached(workshop_id) # Needed by the caller anyway; one query
+    if not is_organizer(workshop, current_user):
         abort(403, description="You do not have permission to perform this action.")
     return workshop
 
-@workshop_bp.route("/<int:workshop_id>/regenerate/rules", methods=["POST"])
-@login_required
-def regenerate_rules(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    try:
-        new_rules_raw = generate_rules_text(workshop_id)
-        if not new_rules_raw.startswith("Could not generate"):
-            workshop.rules = new_rules_raw
-            db.session.commit()
-            new_rules_html = markdown.markdown(new_rules_raw)
-            # Emit WebSocket event (optional but good for real-time updates)
-            socketio.emit('ai_content_update', {
-                'workshop_id': workshop_id,
-                'type': 'rules',
-                'content': new_rules_html
-            }, room=f'workshop_lobby_{workshop_id}')
-            return jsonify({"success": True, "content": new_rules_html})
-        else:
-            return jsonify({"success": False, "message": "Failed to generate new rules."}), 500
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error regenerating rules for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error during regeneration."}), 500
-
-@workshop_bp.route("/<int:workshop_id>/regenerate/icebreaker", methods=["POST"])
-@login_required
-def regenerate_icebreaker(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    try:
-        new_icebreaker_raw = generate_icebreaker_text(workshop_id)
-        if not new_icebreaker_raw.startswith("Could not generate"):
-            workshop.icebreaker = new_icebreaker_raw
-            db.session.commit()
-            new_icebreaker_html = markdown.markdown(new_icebreaker_raw)
-            socketio.emit('ai_content_update', {
-                'workshop_id': workshop_id,
-                'type': 'icebreaker',
-                'content': new_icebreaker_html
-            }, room=f'workshop_lobby_{workshop_id}')
-            return jsonify({"success": True, "content": new_icebreaker_html})
-        else:
-            return jsonify({"success": False, "message": "Failed to generate new icebreaker."}), 500
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error regenerating icebreaker for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error during regeneration."}), 500
-
-@workshop_bp.route("/<int:workshop_id>/regenerate/tip", methods=["POST"])
-@login_required
-def regenerate_tip(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    try:
-        new_tip_raw = generate_tip_text(workshop_id)
-        if not new_tip_raw.startswith("No pre‑workshop data found"):
-            workshop.tip = new_tip_raw
-            db.session.commit()
-            new_tip_html = markdown.markdown(new_tip_raw)
-            socketio.emit('ai_content_update', {
-                'workshop_id': workshop_id,
-                'type': 'tip',
-                'content': new_tip_html
-            }, room=f'workshop_lobby_{workshop_id}')
-            return jsonify({"success": True, "content": new_tip_html})
-        else:
-            return jsonify({"success": False, "message": "Failed to generate new tip."}), 500
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error regenerating tip for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error during regeneration."}), 500
-
-
-@workshop_bp.route("/<int:workshop_id>/edit/rules", methods=["POST"])
-@login_required
-def edit_rules(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    edited_content = request.json.get('content')
-    if edited_content is None:
-        return jsonify({"success": False, "message": "No content provided."}), 400
-    try:
-        workshop.rules = edited_content # Store raw markdown/text
-        db.session.commit()
-        edited_content_html = markdown.markdown(edited_content)
-        socketio.emit('ai_content_update', {
-            'workshop_id': workshop_id,
-            'type': 'rules',
-            'content': edited_content_html
-        }, room=f'workshop_lobby_{workshop_id}')
-        return jsonify({"success": True, "content": edited_content_html})
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error saving edited rules for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error saving edit."}), 500
+# kind -> (generator, render_html); the agenda is emitted raw because clients parse it as JSON
+AI_CONTENT_GENERATORS = {
+    "rules": (generate_rules_text, True),
+    "icebreaker": (generate_icebreaker_text, True),
+    "tip": (generate_tip_text, True),
+    "agenda": (generate_agenda_text, False),
+}
+# Prefixes the generators return instead of content when they fail
+AI_GENERATION_FAILURES = ("Could not generate", "No pre")
 
-@workshop_bp.route("/<int:workshop_id>/edit/icebreaker", methods=["POST"])
-@login_required
-def edit_icebreaker(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    edited_content = request.json.get('content')
-    if edited_content is None:
-        return jsonify({"success": False, "message": "No content provided."}), 400
-    try:
-        workshop.icebreaker = edited_content
-        db.session.commit()
-        edited_content_html = markdown.markdown(edited_content)
-        socketio.emit('ai_content_update', {
-            'workshop_id': workshop_id,
-            'type': 'icebreaker',
-            'content': edited_content_html
-        }, room=f'workshop_lobby_{workshop_id}')
-        return jsonify({"success": True, "content": edited_content_html})
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error saving edited icebreaker for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error saving edit."}), 500
 
-@workshop_bp.route("/<int:workshop_id>/edit/tip", methods=["POST"])
+@workshop_bp.route("/<int:workshop_id>/regenerate/<kind>", methods=["POST"])
 @login_required
-def edit_tip(workshop_id):
+def regenerate_ai_content(workshop_id, kind):
+    if kind not in AI_CONTENT_GENERATORS:
+        abort(404)
     workshop = check_organizer_permission(workshop_id)
-    edited_content = request.json.get('content')
-    if edited_content is None:
-        return jsonify({"success": False, "message": "No content provided."}), 400
+    generator, render_html = AI_CONTENT_GENERATORS[kind]
     try:
-        workshop.tip = edited_content
+        new_raw = generator(workshop_id)
+        if not new_raw or new_raw.startswith(AI_GENERATION_FAILURES):
+            return jsonify({"success": False, "message": f"Failed to generate new {kind}."}), 500
+        setattr(workshop, kind, new_raw)
+        workshop.updated_at = datetime.utcnow() # Invalidates cached lobby render
         db.session.commit()
-        edited_content_html = markdown.markdown(edited_content)
+        content = markdown.markdown(new_raw) if render_html else new_raw
+        # Emit WebSocket event (optional but good for real-time updates)
         socketio.emit('ai_content_update', {
             'workshop_id': workshop_id,
-            'type': 'tip',
-            'content': edited_content_html
+            'type': kind,
+            'content': content
         }, room=f'workshop_lobby_{workshop_id}')
-        return jsonify({"success": True, "content": edited_content_html})
+        return jsonify({"success": True, "content": content})
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error saving edited tip for workshop {workshop_id}: {e}")
-        return jsonify({"success": False, "message": "Server error saving edit."}), 500
-
-
-@workshop_bp.route("/<int:workshop_id>/regenerate/agenda", methods=["POST"])
-@login_required
-def regenerate_agenda(workshop_id):
-    workshop = check_organizer_permission(workshop_id)
-    try:
-        new_agenda = generate_agenda_text(workshop_id)
-        workshop.agenda = new_agenda
-        db.session.commit()
-
-        # Emit the update to the room
-        socketio.emit(
-            "ai_content_update",
-            {
-                "workshop_id": workshop_id,
-                "type": "agenda",
-                "content": new_agenda,
-            },
-            room=f"workshop_lobby_{workshop_id}",
-        )
-        return jsonify({"success": True}), 200
-    except Exception as e:
-        current_app.logger.error(f"Error regenerating agenda: {e}")
-        return jsonify({"error": "Failed to regenerate agenda"}), 500
+        current_app.logger.error(f"Error regenerating {kind} for workshop {workshop_id}: {e}")
+        return jsonify({"success": False, "message": "Server error during regeneration."}), 500
 
 
-@workshop_bp.route("/<int:workshop_id>/edit/agenda", methods=["POST"])
+@workshop_bp.route("/<int:workshop_id>/edit/<kind>", methods=["POST"])
 @login_required
-def edit_agenda(workshop_id):
+def edit_ai_content(workshop_id, kind):
+    if kind not in AI_CONTENT_GENERATORS:
+        abort(404)
     workshop = check_organizer_permission(workshop_id)
     edited_content = request.json.get('content')
     if edited_content is None:
         return jsonify({"success": False, "message": "No content provided."}), 400
     try:
-        workshop.agenda = edited_content # Update the main agenda field
+        setattr(workshop, kind, edited_content) # Store raw markdown/text
+        workshop.updated_at = datetime.utcnow() # Invalidates cached lobby render
         db.session.commit()
-        edited_content_html = markdown.markdown(edited_content)
+        # Clients already hold the markdown and render it with marked.js
         socketio.emit('ai_content_update', {
             'workshop_id': workshop_id,
-            'type': 'agenda', # <-- Use 'agenda' type
-            'content': edited_content_html
+            'type': kind,
+            'content_raw': edited_content
         }, room=f'workshop_lobby_{workshop_id}')
-        return jsonify({"success": True, "content": edited_content_html})
+        response = {"success": True, "content_raw": edited_content}
+        if request.args.get('render_html') == '1':
+            response["content"] = markdown.markdown(edited_content)
+        return jsonify(response)
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error saving edited agenda for workshop {workshop_id}: {e}")
+        current_app.logger.error(f"Error saving edited {kind} for workshop {workshop_id}: {e}")
         return jsonify({"success": False, "message": "Server error saving edit."}), 500
 
 
@@ -1438,12 +1481,11 @@ def edit_agenda(workshop_id):
 def workshop_room(workshop_id):
     """Displays the main workshop room."""
     workshop = Workshop.query.options(
-        selectinload(Workshop.current_task) # Eager load current task if needed often
+        selectinload(Workshop.current_task), # Eager load current task if needed often
+        *DEFER_AI_CONTENT,
     ).get_or_404(workshop_id)
 
-    participant = WorkshopParticipant.query.filter_by(
-        workshop_id=workshop.id, user_id=current_user.user_id
-    ).first()
+    participant = get_participant_cached(workshop.id, current_user.user_id)
 
     if not participant:
         flash("You are not a participant in this workshop.", "danger")
@@ -1474,7 +1516,7 @@ def workshop_room(workshop_id):
 @login_required
 def start_workshop(workshop_id):
     """Starts the workshop (organizer only)."""
-    workshop = Workshop.query.get_or_404(workshop_id)
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
     if not is_organizer(workshop, current_user): # Use helper
         return jsonify({"success": False, "message": "Permission denied"}), 403
 
@@ -1514,7 +1556,8 @@ def start_workshop(workshop_id):
 @login_required
 def pause_workshop(workshop_id):
     """Pauses the workshop (organizer only)."""
-    workshop = Workshop.query.get_or_404(workshop_id)
+    now = datetime.utcnow() # Single timestamp for every field written below
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
     if not is_organizer(workshop, current_user):
         return jsonify({"success": False, "message": "Permission denied"}), 403
 
@@ -1523,9 +1566,9 @@ def pause_workshop(workshop_id):
 
     workshop.status = "paused"
     if workshop.timer_start_time: # Only calculate elapsed time if a timer was running
-        elapsed_this_run = (datetime.utcnow() - workshop.timer_start_time).total_seconds()
+        elapsed_this_run = (now - workshop.timer_start_time).total_seconds()
         workshop.timer_elapsed_before_pause += int(elapsed_this_run)
-        workshop.timer_paused_at = datetime.utcnow()
+        workshop.timer_paused_at = now
         workshop.timer_start_time = None # Clear start time as it's now paused
 
     db.session.commit()
@@ -1541,7 +1584,8 @@ def pause_workshop(workshop_id):
 @login_required
 def resume_workshop(workshop_id):
     """Resumes the workshop (organizer only)."""
-    workshop = Workshop.query.get_or_404(workshop_id)
+    now = datetime.utcnow()
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
     if not is_organizer(workshop, current_user):
         return jsonify({"success": False, "message": "Permission denied"}), 403
 
@@ -1550,7 +1594,7 @@ def resume_workshop(workshop_id):
 
     workshop.status = "inprogress"
     if workshop.current_task_id and workshop.timer_paused_at: # Only set start time if resuming a task timer
-        workshop.timer_start_time = datetime.utcnow() # Set new start time for the current run
+        workshop.timer_start_time = now # Set new start time for the current run
         workshop.timer_paused_at = None # Clear paused time
 
     db.session.commit()
@@ -1567,7 +1611,8 @@ def resume_workshop(workshop_id):
 @login_required
 def stop_workshop(workshop_id):
     """Stops the workshop (organizer only)."""
-    workshop = Workshop.query.get_or_404(workshop_id)
+    now = datetime.utcnow()
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
     if not is_organizer(workshop, current_user):
         return jsonify({"success": False, "message": "Permission denied"}), 403
 
@@ -1578,10 +1623,12 @@ def stop_workshop(workshop_id):
     workshop.status = "completed"
     # Clear current task and timer state
     if workshop.current_task_id:
-        task = BrainstormTask.query.get(workshop.current_task_id)
-        if task and task.status == 'running':
-            task.status = 'completed' # Mark task as completed
-            task.ended_at = datetime.utcnow()
+        # Complete the running task in place rather than loading it first
+        db.session.execute(
+            update(BrainstormTask)
+            .where(BrainstormTask.id == workshop.current_task_id, BrainstormTask.status == 'running')
+            .values(status='completed', ended_at=now)
+        )
     workshop.current_task_id = None
     workshop.timer_start_time = None
     workshop.timer_paused_at = None
@@ -1606,9 +1653,11 @@ def stop_workshop(workshop_id):
 def workshop_report(workshop_id):
     """Displays the post-workshop report."""
     workshop = Workshop.query.get_or_404(workshop_id)
-    participant = WorkshopParticipant.query.filter_by(
-        workshop_id=workshop.id, user_id=current_user.user_id
-    ).first()
+    # Participants (with their User, used by the template) in a single query
+    participants = WorkshopParticipant.query.options(
+        joinedload(WorkshopParticipant.user)
+    ).filter_by(workshop_id=workshop.id).all()
+    participant = next((p for p in participants if p.user_id == current_user.user_id), None)
 
     # Permission checks
     if not participant:
@@ -1631,8 +1680,6 @@ def workshop_report(workshop_id):
                 url_for("workshop_bp.view_workshop", workshop_id=workshop_id)
             )
 
-    # Get participants list
-    participants = WorkshopParticipant.query.filter_by(workshop_id=workshop.id).all()
     # TODO: Fetch generated report data (summary, transcript, action items, etc.)
 
     return render_template(
@@ -1645,27 +1692,57 @@ def workshop_report(workshop_id):
 
 
 
+# --- In-memory cache of generated introduction payloads ---
+# Lets an organizer retry begin_intro after a failed start without re-running the LLM.
+# { workshop_id: (updated_at, expires_at, payload) }
+_intro_payload_cache = {}
+INTRO_PAYLOAD_CACHE_TTL_SECONDS = 600
+
+
+def _get_introduction_payload_cached(workshop_id, updated_at):
+    """Returns a copy of a fresh cached intro payload, or generates (and caches) a new one."""
+    entry = _intro_payload_cache.get(workshop_id)
+    if entry and entry[0] == updated_at and entry[1] > time.monotonic():
+        current_app.logger.debug(f"Using cached introduction payload for workshop {workshop_id}")
+        return copy.deepcopy(entry[2])
+
+    result = get_introduction_payload(workshop_id)
+    if isinstance(result, dict):
+        now = time.monotonic()
+        # Drop expired entries left behind by intros that were never started
+        for expired_id in [k for k, e in _intro_payload_cache.items() if e[1] <= now]:
+            _intro_payload_cache.pop(expired_id, None)
+        _intro_payload_cache[workshop_id] = (
+            updated_at,
+            now + INTRO_PAYLOAD_CACHE_TTL_SECONDS,
+            copy.deepcopy(result),
+        )
+    return result
+
+
 # --- Begin Workshop Introduction Task ---
 @workshop_bp.route("/<int:workshop_id>/begin_intro", methods=["POST"])
 @login_required
 def begin_intro(workshop_id):
-    workshop = Workshop.query.get_or_404(workshop_id)
-    if not is_organizer(workshop, current_user):
+    summary = get_workshop_summary(workshop_id)
+    if not is_organizer(summary, current_user):
         return jsonify(success=False, message="Permission denied"), 403
 
     # Prevent starting intro if already started or not scheduled/inprogress
-    if workshop.current_task_id or workshop.status not in ['scheduled', 'inprogress']:
+    if summary.current_task_id or summary.status not in ['scheduled', 'inprogress']:
          return jsonify(success=False, message="Workshop introduction cannot be started at this time."), 400
 
-    # If starting from scheduled, update status
-    if workshop.status == 'scheduled':
-        workshop.status = 'inprogress'
-
-    result = get_introduction_payload(workshop_id)
+    result = _get_introduction_payload_cached(workshop_id, summary.updated_at)
     if isinstance(result, tuple) and not isinstance(result[0], dict):
         err_msg, code = result
         return jsonify(success=False, message=err_msg), code
 
+    # Load the full row only now that it is about to be mutated
+    workshop = get_workshop_cached(workshop_id, *DEFER_AI_CONTENT)
+    # If starting from scheduled, update status
+    if workshop.status == 'scheduled':
+        workshop.status = 'inprogress'
+
     payload = result
     try:
         
@@ -1700,7 +1777,7 @@ def begin_intro(workshop_id):
         intro_task = BrainstormTask(
             workshop_id=workshop_id,
             title=payload.get("title", "Introduction & Warm-up"),
-            prompt=json.dumps(payload), # Store full payload for context
+            prompt=json.dumps(payload, separators=(",", ":")), # Store full payload for context (compact, serialized once)
             duration=duration_seconds,
             status="running",
             started_at=datetime.utcnow()
@@ -1714,14 +1791,17 @@ def begin_intro(workshop_id):
         workshop.timer_paused_at = None
         workshop.timer_elapsed_before_pause = 0
         workshop.current_task_index = -1 # Indicate intro task is before index 0
+        relax_commit_durability()
 
-        db.session.commit()
-
-        
+        # Fill the client payload before commit expires the instances (no refresh SELECTs);
+        # the stored prompt above was serialized before these additions
         payload['task_id'] = intro_task.id # Add task ID to payload for client
-        payload['duration'] = intro_task.duration # Ensure duration is correct
+        payload['duration'] = duration_seconds # Ensure duration is correct
 
-        emit_introduction_start(f'workshop_room_{workshop.id}', payload) # Use helper
+        db.session.commit()
+        _intro_payload_cache.pop(workshop_id, None) # Intro started; no retry needed
+
+        emit_introduction_start(f'workshop_room_{workshop_id}', payload) # Use helper
         return jsonify(success=True)
 
     except Exception as e:
@@ -1737,129 +1817,101 @@ def begin_intro(workshop_id):
 # --- Workshop Next Task --------------
 from app.service.routes.brainstorming import get_brainstorming_task_payload
 
-@workshop_bp.route("/<int:workshop_id>/next_task", methods=["POST"])
-@login_required
-def next_task(workshop_id):
-    workshop = Workshop.query.get_or_404(workshop_id)
-
-    # --- Permission Check: Only Organizer ---
-    if not is_organizer(workshop, current_user):
-        abort(403)
-
-    # Ensure the workshop is in progress
-    if workshop.status != "inprogress":
-        return jsonify({"error": "Workshop is not in progress."}), 400
-    
-        # --- Mark previous task as completed ---
-    if workshop.current_task_id:
-        previous_task = BrainstormTask.query.get(workshop.current_task_id)
-        if previous_task and previous_task.status == 'running':
-            previous_task.status = 'completed'
-            previous_task.ended_at = datetime.utcnow()
+# --- Task type dispatch: type -> (payload generator, emitter, needs previous task) ---
+# Generators that need the previous task are called as gen(workshop_id, previous_task_id, phase_context),
+# the rest as gen(workshop_id, phase_context).
+_TASK_DISPATCH = {
+    "brainstorming": (get_brainstorming_task_payload, emit_task_ready, False),
+    "clustering_voting": (get_clustering_voting_payload, emit_clusters_ready, True),
+    "results_feasibility": (get_feasibility_payload, emit_feasibility_ready, True),
+    "discussion": (get_discussion_payload, emit_discussion_ready, False),
+    "summary": (get_summary_payload, emit_summary_ready, False),
+}
 
-    # Load the task sequence
-    task_sequence = TASK_SEQUENCE
-
-    if not task_sequence:
-        current_app.logger.warning(f"Task sequence is empty for workshop {workshop_id}")
-        return jsonify({"error": "No tasks in the action plan."}), 400
-
-    # Validate the current index
-    # --- FIX: Default index should be -1 before first task, so next is 0 ---
-    current_index = workshop.current_task_index if workshop.current_task_index is not None else -1
-    next_index = current_index + 1
-    # --------------------------------------------------------------------
-    current_app.logger.info(f"TRACING BREAK POINT: task_sequence: {task_sequence}")
-    current_app.logger.info(f"TRACING BREAK POINT: current_index: {current_index}, next_index: {next_index}") # Log next index
+# Workshops with a task generation in flight (guards against double-clicks on "Next Task")
+_next_task_in_flight = set()
+_next_task_lock = threading.Lock()
 
-    if next_index >= len(task_sequence): # Check if next_index is out of bounds
-        current_app.logger.warning(f"No more tasks in the sequence for workshop {workshop_id}")
-        return jsonify({"error": "No more tasks in the action plan."}), 400
 
-    # Determine the next task type
-    next_task_type = task_sequence[next_index] # Use next_index
-    task_payload = None
-    current_app.logger.info(f"TRACING BREAK POINT: next_task_type: {next_task_type}") # Log next index
-    error_message = None
-    status_code = 500
-    current_app.logger.info(f"TRACING BREAK POINT: next_task_type: {next_task_type}") # Log next index
-    
-    # --- Get Phase Context for LLM ---
-    action_plan_json = workshop.task_sequence or '[]'
-    try:
-        action_plan_list = json.loads(action_plan_json)
-        phase_data = action_plan_list[next_index] if 0 <= next_index < len(action_plan_list) else {}
-        phase_context = f"Phase: {phase_data.get('phase', 'N/A')}\nDescription: {phase_data.get('description', 'N/A')}"
-    except (json.JSONDecodeError, IndexError):
-        phase_context = f"Task Type: {next_task_type}" # Fallback context
-    # -----------------------------------
-    
-    
-    
-    # --- Map task types to functions ---
-    if next_task_type == "brainstorming":
-            result = get_brainstorming_task_payload(workshop_id, phase_context)
-    elif next_task_type == "clustering_voting":
-        previous_task_id = workshop.current_task_id
-        if not previous_task_id:
-            result = ("Cannot start clustering without a previous task.", 400)
-        else:
-            result = get_clustering_voting_payload(workshop_id, previous_task_id, phase_context)
-    elif next_task_type == "results_feasibility":
+def _generate_next_task(app, workshop_id, next_index, next_task_type, phase_context):
+    """
+    Background worker for next_task: generates the payload, advances the workshop
+    and emits the task events. Errors are reported to the room as 'next_task_error'.
+    """
+    room = f"workshop_room_{workshop_id}"
+    with app.app_context():
+        try:
+            error_message = _advance_to_next_task(workshop_id, next_index, next_task_type, phase_context)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error generating next task for workshop {workshop_id}: {e}", exc_info=True)
+            error_message = "Server error generating the next task."
+        finally:
+            with _next_task_lock:
+                _next_task_in_flight.discard(workshop_id)
+            db.session.remove()
+        if error_message:
+            socketio.emit("next_task_error", {"workshop_id": workshop_id, "message": error_message}, to=room)
+
+
+def _advance_to_next_task(workshop_id, next_index, next_task_type, phase_context):
+    """Runs the task generation and state update. Returns an error message, or None on success."""
+    workshop = db.session.get(Workshop, workshop_id)
+    if not workshop or workshop.status != "inprogress":
+        return "Workshop is not in progress."
+
+    # --- Generate the payload via the dispatch table ---
+    entry = _TASK_DISPATCH.get(next_task_type)
+    if entry is None:
+        result = (f"Unsupported task type: {next_task_type}", 400)
+    else:
+        generator, _, needs_previous_task = entry
         previous_task_id = workshop.current_task_id
-        if not previous_task_id:
-            result = ("Cannot start feasibility without a previous task.", 400)
+        if not needs_previous_task:
+            result = generator(workshop_id, phase_context)
+        elif not previous_task_id:
+            result = (f"Cannot start {next_task_type} without a previous task.", 400)
         else:
-            result = get_feasibility_payload(workshop_id, previous_task_id, phase_context)
-    elif next_task_type == "discussion":
-            result = get_discussion_payload(workshop_id, phase_context)
-    elif next_task_type == "summary":
-            result = get_summary_payload(workshop_id, phase_context)
-    else:
-        result = (f"Unsupported task type: {next_task_type}", 400)
+            result = generator(workshop_id, previous_task_id, phase_context)
     # -----------------------------------
 
-
-
     # --- Handle result from service function ---
     if isinstance(result, tuple):
         error_message, status_code = result
-        return jsonify({"error": error_message}), status_code
-
+        db.session.rollback()
+        return error_message
     elif isinstance(result, dict):
         task_payload = result
     else:
         # Should not happen if service functions are correct
-        return jsonify({"error": "Internal error generating task payload."}), 500
+        db.session.rollback()
+        return "Internal error generating task payload."
     # ------------------------------------------
 
-
     current_app.logger.debug(f"Task payload before override: {task_payload}")
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
     # --- Update Workshop State ---
     new_task_id = task_payload.get('task_id')
     if not new_task_id:
         current_app.logger.error(f"Task payload for {next_task_type} missing 'task_id'. Payload: {task_payload}")
-        return jsonify({"error": "Internal error: Task ID missing after generation."}), 500
+        db.session.rollback()
+        return "Internal error: Task ID missing after generation."
 
     new_task = BrainstormTask.query.get(new_task_id)
     if not new_task:
         current_app.logger.error(f"Could not find newly created task with ID {new_task_id}")
-        return jsonify({"error": "Internal error: Failed to retrieve new task."}), 500
+        db.session.rollback()
+        return "Internal error: Failed to retrieve new task."
+
+    # --- Mark previous task as completed ---
+    # A single guarded UPDATE, issued after generation so no read precedes the LLM call
+    # and the write lock isn't held while it runs
+    if workshop.current_task_id:
+        db.session.execute(
+            update(BrainstormTask)
+            .where(BrainstormTask.id == workshop.current_task_id, BrainstormTask.status == 'running')
+            .values(status='completed', ended_at=datetime.utcnow())
+        )
 
     workshop.current_task_id = new_task_id
     workshop.current_task_index = next_index
@@ -1869,6 +1921,7 @@ def next_task(workshop_id):
     new_task.status = 'running' # Mark the new task as running
     new_task.started_at = workshop.timer_start_time
 
+    relax_commit_durability()
     db.session.commit() # Commit workshop update and task status/start time
     current_app.logger.info(f"Workshop {workshop_id} advanced to task {new_task_id} (Index: {next_index}, Type: {next_task_type})")
     # ---------------------------
@@ -1877,19 +1930,11 @@ def next_task(workshop_id):
     room = f"workshop_room_{workshop_id}"
     task_type_in_payload = task_payload.get("task_type")
 
-    if task_type_in_payload == "brainstorming":
-        emit_task_ready(room, task_payload)
-    elif task_type_in_payload == "clustering_voting":
-        emit_clusters_ready(room, task_payload) # Use specific emitter
-    elif task_type_in_payload == "results_feasibility":
-        emit_feasibility_ready(room, task_payload) # Use specific emitter
-    elif task_type_in_payload == "discussion":
-        emit_discussion_ready(room, task_payload) # Use specific emitter
-    elif task_type_in_payload == "summary":
-        emit_summary_ready(room, task_payload) # Use specific emitter
-    else:
+    entry = _TASK_DISPATCH.get(task_type_in_payload)
+    if entry is None:
         current_app.logger.error(f"Unknown task type '{task_type_in_payload}' in payload for workshop {workshop_id}")
-        return jsonify({"error": "Internal error: Unknown task type generated."}), 500
+        return "Internal error: Unknown task type generated."
+    entry[1](room, task_payload) # Task-specific *_ready emitter
     # ------------------------------------------
 
 
@@ -1899,9 +1944,81 @@ def next_task(workshop_id):
         "remaining_seconds": new_task.duration,
         "is_paused": False
     })
-    db.session.commit()
+    return None
+
+
+@workshop_bp.route("/<int:workshop_id>/next_task", methods=["POST"])
+@login_required
+def next_task(workshop_id):
+    # Read-only here; the background worker loads the ORM row it mutates
+    workshop = get_workshop_summary(workshop_id)
+
+    # --- Permission Check: Only Organizer ---
+    if not is_organizer(workshop, current_user):
+        abort(403)
+
+    # Ensure the workshop is in progress
+    if workshop.status != "inprogress":
+        return jsonify({"error": "Workshop is not in progress."}), 400
+
+    # Load the task sequence
+    task_sequence = TASK_SEQUENCE
+
+    if not task_sequence:
+        current_app.logger.warning(f"Task sequence is empty for workshop {workshop_id}")
+        return jsonify({"error": "No tasks in the action plan."}), 400
+
+    # Validate the current index
+    # --- FIX: Default index should be -1 before first task, so next is 0 ---
+    current_index = workshop.current_task_index if workshop.current_task_index is not None else -1
+    next_index = current_index + 1
+    # --------------------------------------------------------------------
+    current_app.logger.info(f"TRACING BREAK POINT: task_sequence: {task_sequence}")
+    current_app.logger.info(f"TRACING BREAK POINT: current_index: {current_index}, next_index: {next_index}") # Log next index
+
+    if next_index >= len(task_sequence): # Check if next_index is out of bounds
+        current_app.logger.warning(f"No more tasks in the sequence for workshop {workshop_id}")
+        return jsonify({"error": "No more tasks in the action plan."}), 400
+
+    # Determine the next task type
+    next_task_type = task_sequence[next_index] # Use next_index
+    current_app.logger.info(f"TRACING BREAK POINT: next_task_type: {next_task_type}") # Log next index
+    if next_task_type not in _TASK_DISPATCH:
+        return jsonify({"error": f"Unsupported task type: {next_task_type}"}), 400
+
+    # --- Get Phase Context for LLM ---
+    action_plan_json = workshop.task_sequence or '[]'
+    try:
+        action_plan_list = parse_action_plan(action_plan_json)
+        phase_data = action_plan_list[next_index] if 0 <= next_index < len(action_plan_list) else {}
+        phase_context = f"Phase: {phase_data.get('phase', 'N/A')}\nDescription: {phase_data.get('description', 'N/A')}"
+    except (json.JSONDecodeError, IndexError):
+        phase_context = f"Task Type: {next_task_type}" # Fallback context
+    # -----------------------------------
+
+    # --- Hand generation off to a background task ---
+    # LLM generation can take several seconds; clients are notified via the *_ready events.
+    with _next_task_lock:
+        if workshop_id in _next_task_in_flight:
+            return jsonify({"success": False, "message": "The next task is already being generated."}), 409
+        _next_task_in_flight.add(workshop_id)
+
+    try:
+        socketio.start_background_task(
+            _generate_next_task,
+            current_app._get_current_object(),
+            workshop_id,
+            next_index,
+            next_task_type,
+            phase_context,
+        )
+    except Exception:
+        # The worker never started, so it won't clear the flag itself
+        with _next_task_lock:
+            _next_task_in_flight.discard(workshop_id)
+        raise
+    return jsonify({"success": True, "status": "pending"}), 202
 
-    return jsonify({"success": True, "task": task_payload})
 
 @workshop_bp.route("/<int:workshop_id>/submit_idea", methods=["POST"])
 @login_required
@@ -1915,13 +2032,14 @@ def submit_idea(workshop_id):
     if not task_id: return jsonify(success=False, message="Task ID required."), 400
     if not content: return jsonify(success=False, message="Idea content required."), 400
 
-    workshop = Workshop.query.get(workshop_id) # Get workshop to check current task and timer
+    # Get workshop to check current task and timer; the task's duration comes in the same query
+    workshop = Workshop.query.options(
+        joinedload(Workshop.current_task), *DEFER_AI_CONTENT
+    ).get(workshop_id)
     if not workshop: return jsonify(success=False, message="Workshop not found."), 404
 
-    participant_record = WorkshopParticipant.query.filter_by(
-         workshop_id=workshop_id, user_id=current_user.user_id
-    ).first()
-    if not participant_record: return jsonify(success=False, message="Not a participant."), 403
+    participant_id = get_participant_id_cached(workshop_id, current_user.user_id)
+    if not participant_id: return jsonify(success=False, message="Not a participant."), 403
 
     # --- Validation: Check against current task and timer ---
     if workshop.current_task_id != task_id:
@@ -1933,25 +2051,25 @@ def submit_idea(workshop_id):
          return jsonify(success=False, message="Time for this task has expired."), 400
     # -------------------------------------------------------
 
-    task = BrainstormTask.query.get(task_id) # Task should exist if it's the current one
-    if not task: return jsonify(success=False, message="Task not found."), 404 # Should not happen
-
+    # task_id is the workshop's current task (checked above), so it needn't be loaded
     try:
         idea = BrainstormIdea(
-            task_id=task.id,
-            participant_id=participant_record.id,
+            task_id=task_id,
+            participant_id=participant_id,
             content=content,
-            timestamp=datetime.utcnow()
         )
         db.session.add(idea)
+        db.session.flush()
+        idea_id = idea.id # Read before commit expires the instance (avoids a refresh SELECT)
+        user_display_name = current_user.first_name or current_user.email.split('@')[0]
         db.session.commit()
 
-        user_display_name = current_user.first_name or current_user.email.split('@')[0]
-        socketio.emit("new_idea", { # Changed event name to match JS
+        # Broadcast off the request path; the idea is already committed above
+        socketio.start_background_task(socketio.emit, "new_idea", { # Changed event name to match JS
             "user": user_display_name,
             "content": content,
-            "idea_id": idea.id,
-            "task_id": task.id
+            "idea_id": idea_id,
+            "task_id": task_id
         }, room=f"workshop_room_{workshop_id}")
         
         # --- ADDED: Call Moderator ---
@@ -1960,7 +2078,7 @@ def submit_idea(workshop_id):
         check_and_nudge(workshop_id, current_user.user_id, current_participants)
         # ---------------------------
 
-        return jsonify(success=True, idea_id=idea.id), 200
+        return jsonify(success=True, idea_id=idea_id), 200
 
     except Exception as e:
         db.session.rollback()
@@ -1981,19 +2099,14 @@ def beacon_leave(workshop_id):
             current_app.logger.info(f"[Beacon] Received leave notification for user {user_id} from room {room}")
 
             # --- Simulate disconnect logic ---
-            # Find SIDs associated with this user in this room
-            sids_to_remove = [sid for sid, info in _sid_registry.items() if info.get("workshop_id") == workshop_id and info.get("user_id") == user_id]
+            # Drop the user's SIDs and presence in one step; None if they weren't registered
+            remaining = _evict_user_from_room(room, workshop_id, user_id)
 
-            if sids_to_remove:
-                 _room_presence[room].discard(user_id)
-                 for sid in sids_to_remove:
-                     _sid_registry.pop(sid, None)
+            if remaining is not None:
                  current_app.logger.info(f"[Beacon] Cleaned up presence for user {user_id} in room {room}")
                  # Broadcast update if room still active
-                 if room in _room_presence and _room_presence[room]:
+                 if remaining:
                      _broadcast_participant_list(room, workshop_id)
-                 elif room in _room_presence:
-                     del _room_presence[room]
             # --- End Simulate disconnect ---
 
         else:
@@ -1,31 +1,87 @@
 # app/workspace/routes.py
 
 import os
-from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify, current_app
+import re
+import secrets
+from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify, current_app, g
 from flask_login import login_required, current_user
-from app.extensions import db
-from app.models import Workspace, WorkspaceMember, User, Invitation, Document, Workshop
-from datetime import datetime
+from app.extensions import db, socketio
+from app.models import Workspace, WorkspaceMember, User, Invitation, Document, Workshop, utc_now
+from app.auth.routes import send_email
+from app.utils.static_files import static_file_exists
+from app.utils.email_utils import is_valid_email
+from markupsafe import escape
 from flask_mail import Message
 from sqlalchemy import desc
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, raiseload, lazyload, load_only, undefer
 
 APP_NAME = os.getenv("APP_NAME", "BrainStormX")
 workspace_bp = Blueprint("workspace_bp", __name__, template_folder="templates")
+DETAILS_PER_PAGE = 25 # Documents/workshops shown per page on the workspace details view
+BULK_INVITE_MAX_EMAILS = 50 # Addresses accepted per bulk invite submission
+
+
+# --- Helper for queries whose template needs are fully eager-loaded ---
+def strict_loading():
+    """Loader options that forbid further lazy loads when RAISE_ON_LAZY_LOAD is enabled."""
+    return (raiseload('*'),) if current_app.config.get("RAISE_ON_LAZY_LOAD") else ()
+
+
+# --- Helper to load a workspace once per request ---
+def get_workspace_cached(workspace_id):
+    """Returns the Workspace for workspace_id, querying at most once per request."""
+    workspaces = g.setdefault('_workspaces', {})
+    workspace = workspaces.get(workspace_id)
+    if workspace is None:
+        workspace = Workspace.query.get_or_404(workspace_id)
+        workspaces[workspace_id] = workspace
+    return workspace
 
 
 # --- Helper Function for Permission Check ---
 def check_admin_permission(workspace_id, user_id):
-    """Checks if the user is an admin or manager of the workspace."""
-    workspace = Workspace.query.get_or_404(workspace_id)
-    # Owner always has permission
-    if workspace.owner_id == user_id:
-        return True
-    # Check for admin/manager role in WorkspaceMember
-    membership = WorkspaceMember.query.filter_by(
-        workspace_id=workspace_id, user_id=user_id, status='active'
-    ).first()
-    return membership and membership.role in ['admin', 'manager']
+    """
+    Checks if the user is the owner, or an admin or manager, of the workspace.
+    Returns (workspace, has_permission) so callers can reuse the loaded workspace;
+    memoized on g for the request.
+    """
+    cache = g.setdefault('_admin_perm', {})
+    key = (workspace_id, user_id)
+    if key not in cache:
+        workspace = get_workspace_cached(workspace_id)
+        # Owner always has permission
+        if workspace.owner_id == user_id:
+            has_permission = True
+        else:
+            # Check for admin/manager role among the members loaded with the workspace
+            membership = workspace.member_by_user(user_id, status='active')
+            has_permission = bool(membership and membership.role in ['admin', 'manager'])
+        cache[key] = (workspace, has_permission)
+    return cache[key]
+
+
+# --- Helpers to send email without blocking the request ---
+def send_emails_in_background(messages):
+    """
+    Sends (to_address, subject, body_html) messages one after another from a single
+    background green thread so responses don't wait on SMTP.
+    """
+    app = current_app._get_current_object()
+
+    def _send():
+        with app.app_context():
+            for to_address, subject, body_html in messages:
+                try:
+                    send_email(to_address=to_address, subject=subject, body_html=body_html)
+                except Exception as e:
+                    app.logger.error(f"Error sending email to {to_address}: {e}", exc_info=True)
+
+    socketio.start_background_task(_send)
+
+
+def send_email_in_background(to_address, subject, body_html):
+    send_emails_in_background([(to_address, subject, body_html)])
 
 
 
@@ -44,16 +100,26 @@ def list_workspaces():
     """
     Shows workspaces the user belongs to, and optionally public workspaces they can join.
     """
-    # Workspaces the current user is in:
-    my_workspace_ids = [m.workspace_id for m in current_user.workspace_memberships]
-    my_workspaces = Workspace.query.filter(
-        Workspace.workspace_id.in_(my_workspace_ids)
-    ).all()
+    # The cards only show name/privacy/member count and link by id: skip description etc. and the selectin members load
+    card_options = (
+        load_only(Workspace.workspace_id, Workspace.name, Workspace.is_private),
+        undefer(Workspace.active_member_count), # COUNT subquery instead of loading member rows
+        lazyload(Workspace.members),
+    )
+
+    # Workspaces the current user is in (joined server-side, no id list round-trip):
+    my_workspaces = (
+        Workspace.query.options(*card_options)
+        .join(WorkspaceMember, WorkspaceMember.workspace_id == Workspace.workspace_id)
+        .filter(WorkspaceMember.user_id == current_user.user_id)
+        .all()
+    )
 
-    # Optionally list all public workspaces that the user is not in:
+    # Optionally list all public workspaces that the user is not in (NOT EXISTS):
     public_workspaces = (
-        Workspace.query.filter_by(is_private=False)
-        .filter(~Workspace.workspace_id.in_(my_workspace_ids))
+        Workspace.query.options(*card_options)
+        .filter_by(is_private=False)
+        .filter(~Workspace.members.any(WorkspaceMember.user_id == current_user.user_id))
         .all()
     )
 
@@ -80,18 +146,7 @@ def create_workspace():
             # --- Return render_template instead of redirect to preserve form data (optional but good UX) ---
             return render_template("workspace_create.html", name=name, description=description, is_private=is_private)
 
-        # Check if name already in use
-        existing = Workspace.query.filter_by(name=name).first()
-        if existing:
-            flash(
-                f"Workspace '{name}' already exists. Please choose a different name.",
-                "danger",
-            )
-            # --- Return render_template instead of redirect ---
-            return render_template("workspace_create.html", name=name, description=description, is_private=is_private)
-
-
-        # Create the workspace object
+        # Create the workspace object (the unique name constraint rejects duplicates on flush)
         new_workspace = Workspace(
             name=name,
             owner_id=current_user.user_id,
@@ -121,6 +176,14 @@ def create_workspace():
                     "workspace_bp.view_workspace", workspace_id=new_workspace.workspace_id
                 )
             )
+        except IntegrityError:
+            db.session.rollback()
+            flash(
+                f"Workspace '{name}' already exists. Please choose a different name.",
+                "danger",
+            )
+            # --- Return render_template instead of redirect ---
+            return render_template("workspace_create.html", name=name, description=description, is_private=is_private)
         except Exception as e:
             db.session.rollback() # Rollback the transaction on error
             current_app.logger.error(f"Error creating workspace: {e}")
@@ -142,13 +205,13 @@ def edit_workspace(workspace_id):
     """
     Allows the workspace owner or admin to edit workspace details.
     """
-    workspace = Workspace.query.get_or_404(workspace_id)
+    workspace = Workspace.query.options(
+        selectinload(Workspace.members)
+    ).get_or_404(workspace_id)
 
     # --- Permission Check: Only owner or admin can edit ---
     is_owner = workspace.owner_id == current_user.user_id
-    membership = WorkspaceMember.query.filter_by(
-        workspace_id=workspace_id, user_id=current_user.user_id, status='active'
-    ).first()
+    membership = workspace.member_by_user(current_user.user_id, status='active')
     is_admin = membership and membership.role == 'admin'
 
     if not (is_owner or is_admin):
@@ -182,7 +245,7 @@ def edit_workspace(workspace_id):
         workspace.name = new_name
         workspace.description = new_description
         workspace.is_private = new_is_private
-        workspace.updated_timestamp = datetime.utcnow() # Explicitly update timestamp
+        workspace.updated_timestamp = utc_now() # Explicitly update timestamp (stamped by the DB in UTC)
 
         try:
             db.session.commit()
@@ -212,54 +275,58 @@ def view_workspace(workspace_id):
     """
     workspace = (
         Workspace.query.options(
-            # fetch members and each member’s user in one round‑trip
-            selectinload(Workspace.members).selectinload(WorkspaceMember.user)
+            # fetch active and pending members (split by status in SQL) with their users
+            selectinload(Workspace.active_members).selectinload(WorkspaceMember.user),
+            selectinload(Workspace.pending_members).selectinload(WorkspaceMember.user),
+            lazyload(Workspace.members), # the combined list isn't needed here
+            *strict_loading()
         )
         .get_or_404(workspace_id)
     )
-    my_membership = None # Initialize
+    # The user's active membership, found in the already-loaded active members
+    my_membership = next(
+        (m for m in workspace.active_members if m.user_id == current_user.user_id),
+        None,
+    )
 
 
     # If private, must be a member or owner
     if workspace.is_private:
-        my_membership = WorkspaceMember.query.filter_by(
-            workspace_id=workspace_id, user_id=current_user.user_id, status='active' # Ensure member is active
-        ).first()
         # Also allow owner even if they somehow aren't a member (shouldn't happen with current logic)
         is_owner = workspace.owner_id == current_user.user_id
         if not my_membership and not is_owner:
             flash("This workspace is private. Access denied.", "danger")
             return redirect(url_for("workspace_bp.list_workspaces"))
-    else:
-         # For public workspaces, still useful to know the user's membership status/role
-         my_membership = WorkspaceMember.query.filter_by(
-            workspace_id=workspace_id, user_id=current_user.user_id, status='active'
-        ).first()
 
     # --- Prepare Member Data for Template ---
-    all_members = workspace.members  # Get all members (already eager loaded)
-    active_members = [m for m in all_members if m.status == 'active']
-    pending_members = [m for m in all_members if m.status != 'active'] # Includes 'invited', 'requested', etc.
+    active_members = workspace.active_members
+    pending_members = workspace.pending_members # Includes 'invited', 'requested', etc.
     active_member_count = len(active_members)
 
-    # --- Fetch Workspace Documents ---
-    workspace_documents = Document.query.options(
-            joinedload(Document.uploader) # Eager load uploader details
+    # --- Fetch Workspace Documents (one page at a time) ---
+    documents_page = Document.query.options(
+            joinedload(Document.uploader), # Eager load uploader details
+            *strict_loading()
         ).filter_by(
             workspace_id=workspace_id
         ).order_by(
             Document.uploaded_at.desc() # Show newest first
-        ).all()
+        ).paginate(
+            page=request.args.get("docs_page", 1, type=int), per_page=DETAILS_PER_PAGE, error_out=False
+        )
 
-    # --- Fetch Workspace Workshops ---
+    # --- Fetch Workspace Workshops (one page at a time) ---
     # Eager load creator to avoid N+1 in template
-    workspace_workshops = Workshop.query.options(
-            joinedload(Workshop.creator)
+    workshops_page = Workshop.query.options(
+            joinedload(Workshop.creator),
+            *strict_loading()
         ).filter_by(
             workspace_id=workspace_id
         ).order_by(
             Workshop.date_time.asc() # Show upcoming first
-        ).all()
+        ).paginate(
+            page=request.args.get("ws_page", 1, type=int), per_page=DETAILS_PER_PAGE, error_out=False
+        )
     
     # --- Determine Edit Permission ---
     can_edit = (workspace.owner_id == current_user.user_id) or \
@@ -276,7 +343,8 @@ def view_workspace(workspace_id):
     return render_template( 
         "workspace_details.html",
         workspace=workspace,
-        documents=workspace_documents,
+        documents=documents_page.items,
+        documents_page=documents_page,
         my_membership=my_membership,
         can_edit=can_edit,
         can_manage_members=can_manage_members, # Pass this flag
@@ -285,7 +353,8 @@ def view_workspace(workspace_id):
         pending_members=pending_members,
         active_member_count=active_member_count,
         # --- ADDED: Pass workshops and permission ---
-        workshops=workspace_workshops,
+        workshops=workshops_page.items,
+        workshops_page=workshops_page,
         can_create_workshop=can_create_workshop
     )
 
@@ -301,24 +370,22 @@ def invite_member():
     and record an Invitation so they can choose to accept or decline.
     If the user does not exist, create an Invitation record and send a registration link.
     """
-    import secrets
-
     workspace_id = request.form.get("workspace_id", type=int)
     email = request.form.get("email", "").strip().lower()
     custom_message = request.form.get("custom_message", "").strip()
     workspace = Workspace.query.get_or_404(workspace_id)
 
     # Check permission
-    my_membership = WorkspaceMember.query.filter_by(
-        workspace_id=workspace_id, user_id=current_user.user_id
-    ).first()
+    my_membership = workspace.member_by_user(current_user.user_id)
     if not my_membership or my_membership.role not in ["admin", "manager"]:
         flash("You do not have permission to invite members.", "danger")
         return redirect(
             url_for("workspace_bp.view_workspace", workspace_id=workspace_id)
         )
 
-    from app.auth.routes import send_email
+    if not is_valid_email(email):
+        flash("Please enter a valid email address.", "danger")
+        return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
     invited_user = User.query.filter_by(email=email).first()
     
@@ -327,30 +394,15 @@ def invite_member():
 
     # For existing users:
     if invited_user:
-        # Check if membership already exists
-        existing_membership = WorkspaceMember.query.filter_by(
-            workspace_id=workspace_id, user_id=invited_user.user_id
-        ).first()
-        if existing_membership:
-            flash(
-                "That user is already in the workspace or has been invited.", "warning"
-            )
-            return redirect(
-                url_for("workspace_bp.view_workspace", workspace_id=workspace_id)
-            )
-
-        # Create membership with status 'invited'
+        # Create membership with status 'invited'; the (workspace, user) unique
+        # constraint rejects users who are already in the workspace or invited
         new_membership = WorkspaceMember(
             workspace_id=workspace_id,
             user_id=invited_user.user_id,
             role="user",
             status="invited",
         )
-        db.session.add(new_membership)
-        db.session.commit()
-
-        # Create an Invitation record for existing users too
-        invitation_token = secrets.token_urlsafe(32)
+        # Create an Invitation record for existing users too (reusing the token above)
         invitation = Invitation(
             token=invitation_token,
             workspace_id=workspace_id,
@@ -358,23 +410,36 @@ def invite_member():
             email=email,
             custom_message=custom_message,
         )
-        db.session.add(invitation)
-        db.session.commit()
+        # Membership and invitation are written in a single transaction
+        db.session.add_all([new_membership, invitation])
+        try:
+            db.session.flush() # Assigns invitation.id
+            invitation_id = invitation.id
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(
+                "That user is already in the workspace or has been invited.", "warning"
+            )
+            return redirect(
+                url_for("workspace_bp.view_workspace", workspace_id=workspace_id)
+            )
 
         # Build a link to the respond invitation page
         invitation_link = url_for(
             "workspace_bp.respond_invitation",
-            invitation_id=invitation.id,
+            invitation_id=invitation_id,
             _external=True,
         )
-        email_body = f"""
-        <p>Hello {invited_user.first_name or invited_user.username},</p>
-        <p>You have been invited to join the workspace <strong>{workspace.name}</strong> on {APP_NAME}.</p>
-        <p>{custom_message}</p>
-        <p>Please click the link below to accept or decline the invitation:</p>
-        <p><a href="{invitation_link}">Respond to Invitation</a></p>
-        """
-        send_email(
+        email_body = render_template(
+            "emails/invitation_existing.html",
+            user=invited_user,
+            workspace=workspace,
+            link=invitation_link,
+            message=custom_message, # Autoescaped by Jinja
+            app_name=APP_NAME,
+        )
+        send_email_in_background(
             to_address=email,
             subject=f"Invitation to Join {APP_NAME} Workspace",
             body_html=email_body,
@@ -399,14 +464,14 @@ def invite_member():
             workspace_id=workspace_id,
             _external=True,
         )
-        email_body = f"""
-        <p>Hello,</p>
-        <p>You have been invited to join the workspace <strong>{workspace.name}</strong> on {APP_NAME}.</p>
-        <p>{custom_message}</p>
-        <p>Please register using the following link. Once you register, you'll be automatically added to the workspace:</p>
-        <p><a href="{registration_link}">Register on {APP_NAME}</a></p>
-        """
-        send_email(
+        email_body = render_template(
+            "emails/invitation_new.html",
+            workspace=workspace,
+            link=registration_link,
+            message=custom_message, # Autoescaped by Jinja
+            app_name=APP_NAME,
+        )
+        send_email_in_background(
             to_address=email,
             subject=f"Invitation to Join {APP_NAME} Workspace",
             body_html=email_body,
@@ -415,6 +480,107 @@ def invite_member():
 
     return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
+###################################
+# 5b. Bulk Invite Users to Workspace
+###################################
+@workspace_bp.route("/invite_members_bulk", methods=["POST"])
+@login_required
+def invite_members_bulk():
+    """
+    Same as invite_member, for a pasted list of emails (comma, semicolon or whitespace separated).
+    Memberships and invitations are inserted in one batch per table and committed once.
+    """
+    workspace_id = request.form.get("workspace_id", type=int)
+    custom_message = request.form.get("custom_message", "").strip()
+    workspace = get_workspace_cached(workspace_id)
+
+    # Check permission
+    my_membership = workspace.member_by_user(current_user.user_id)
+    if not my_membership or my_membership.role not in ["admin", "manager"]:
+        flash("You do not have permission to invite members.", "danger")
+        return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
+
+    # Normalize and de-duplicate, keeping the pasted order
+    raw_emails = [e for e in re.split(r"[,;\s]+", request.form.get("emails", "").lower()) if e]
+    emails = list(dict.fromkeys(e for e in raw_emails if is_valid_email(e)))
+    rejected = list(dict.fromkeys(e for e in raw_emails if not is_valid_email(e)))
+    if rejected:
+        # Flash messages render unescaped; these are raw user input
+        flash(f"Skipped invalid email address(es): {escape(', '.join(rejected))}", "warning")
+    if not emails:
+        flash("Please provide at least one valid email address.", "warning")
+        return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
+    if len(emails) > BULK_INVITE_MAX_EMAILS:
+        flash(f"Please invite at most {BULK_INVITE_MAX_EMAILS} addresses at a time.", "warning")
+        return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
+
+    # One lookup for all existing users; skip anyone already in (or invited to) the workspace
+    users_by_email = {u.email: u for u in User.query.filter(User.email.in_(emails)).all()}
+    skipped = [e for e in emails if e in users_by_email and workspace.member_by_user(users_by_email[e].user_id)]
+    emails = [e for e in emails if e not in skipped]
+
+    member_rows = [
+        dict(workspace_id=workspace_id, user_id=users_by_email[e].user_id, role="user", status="invited")
+        for e in emails if e in users_by_email
+    ]
+    invitation_rows = [
+        dict(
+            token=secrets.token_urlsafe(32),
+            workspace_id=workspace_id,
+            inviter_id=current_user.user_id,
+            email=e,
+            custom_message=custom_message,
+        )
+        for e in emails
+    ]
+
+    if invitation_rows:
+        try:
+            db.session.bulk_insert_mappings(WorkspaceMember, member_rows)
+            db.session.bulk_insert_mappings(Invitation, invitation_rows, return_defaults=True) # ids for the respond links
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash("Some of those users were invited concurrently. Please try again.", "warning")
+            return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
+
+    # Emails go out from one background task after the single commit
+    subject = f"Invitation to Join {APP_NAME} Workspace"
+    messages = []
+    for row in invitation_rows:
+        invited_user = users_by_email.get(row["email"])
+        if invited_user:
+            email_body = render_template(
+                "emails/invitation_existing.html",
+                user=invited_user,
+                workspace=workspace,
+                link=url_for("workspace_bp.respond_invitation", invitation_id=row["id"], _external=True),
+                message=custom_message, # Autoescaped by Jinja
+                app_name=APP_NAME,
+            )
+        else:
+            email_body = render_template(
+                "emails/invitation_new.html",
+                workspace=workspace,
+                link=url_for(
+                    "auth_bp.register",
+                    invitation_token=row["token"],
+                    workspace_id=workspace_id,
+                    _external=True,
+                ),
+                message=custom_message, # Autoescaped by Jinja
+                app_name=APP_NAME,
+            )
+        messages.append((row["email"], subject, email_body))
+    if messages:
+        send_emails_in_background(messages)
+
+    if invitation_rows:
+        flash(f"Invitations sent to {len(invitation_rows)} email(s).", "success")
+    if skipped:
+        flash(f"Already in the workspace or invited: {', '.join(skipped)}", "info")
+    return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
+
 ###################################
 # 6. Request to Join Workspace
 ###################################
@@ -426,15 +592,7 @@ def request_join(workspace_id):
     """
     workspace = Workspace.query.get_or_404(workspace_id)
 
-    # Check if the user is already a member
-    existing_member = WorkspaceMember.query.filter_by(
-        workspace_id=workspace_id, user_id=current_user.user_id
-    ).first()
-    if existing_member:
-        flash("You are already a member of this workspace.", "info")
-        return redirect(url_for("workspace_bp.list_workspaces"))
-
-    # Add the user as a pending member
+    # Add the user as a pending member; the unique constraint catches existing members
     new_member = WorkspaceMember(
         workspace_id=workspace_id,
         user_id=current_user.user_id,
@@ -442,7 +600,12 @@ def request_join(workspace_id):
         status="requested",
     )
     db.session.add(new_member)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash("You are already a member of this workspace.", "info")
+        return redirect(url_for("workspace_bp.list_workspaces"))
 
     flash("Your request to join the workspace has been sent.", "success")
     return redirect(url_for("workspace_bp.list_workspaces"))
@@ -454,21 +617,25 @@ def request_join(workspace_id):
 @login_required
 def approve_member(workspace_id, member_id):
     """Approves a pending member (status 'requested' or 'invited')."""
-    if not check_admin_permission(workspace_id, current_user.user_id):
+    workspace, has_permission = check_admin_permission(workspace_id, current_user.user_id)
+    if not has_permission:
         flash("You don't have permission to manage members.", "danger")
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
-    member = WorkspaceMember.query.filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
+    member = WorkspaceMember.query.options(
+        joinedload(WorkspaceMember.user) # Loaded now for the flash message below
+    ).filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
 
     if member.status not in ['requested', 'invited']:
         flash("This member is not pending approval.", "warning")
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
     try:
+        email = member.user.email # Read before commit expires the instance
         member.status = 'active'
-        member.joined_timestamp = datetime.utcnow() # Set join time on approval
+        member.joined_timestamp = utc_now() # Set join time on approval (stamped by the DB in UTC)
         db.session.commit()
-        flash(f"Member {member.user.email} approved.", "success")
+        flash(f"Member {email} approved.", "success")
         # TODO: Optionally send an email notification to the approved user
     except Exception as e:
         db.session.rollback()
@@ -484,11 +651,14 @@ def approve_member(workspace_id, member_id):
 @login_required
 def reject_member(workspace_id, member_id):
     """Rejects a pending member (status 'requested' or 'invited') by deleting the record."""
-    if not check_admin_permission(workspace_id, current_user.user_id):
+    workspace, has_permission = check_admin_permission(workspace_id, current_user.user_id)
+    if not has_permission:
         flash("You don't have permission to manage members.", "danger")
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
-    member = WorkspaceMember.query.filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
+    member = WorkspaceMember.query.options(
+        joinedload(WorkspaceMember.user) # Loaded now for the flash message below
+    ).filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
 
     if member.status not in ['requested', 'invited']:
         flash("This member is not pending rejection.", "warning")
@@ -514,12 +684,14 @@ def reject_member(workspace_id, member_id):
 @login_required
 def remove_member(workspace_id, member_id):
     """Removes an active member from the workspace."""
-    workspace = Workspace.query.get_or_404(workspace_id) # Need workspace to check owner
-    if not check_admin_permission(workspace_id, current_user.user_id):
+    workspace, has_permission = check_admin_permission(workspace_id, current_user.user_id)
+    if not has_permission:
         flash("You don't have permission to manage members.", "danger")
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
-    member = WorkspaceMember.query.filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
+    member = WorkspaceMember.query.options(
+        joinedload(WorkspaceMember.user) # Loaded now for the flash message below
+    ).filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
 
     # Prevent removing the workspace owner
     if member.user_id == workspace.owner_id:
@@ -556,21 +728,21 @@ def remove_member(workspace_id, member_id):
 @login_required
 def change_role(workspace_id, member_id):
     """Changes the role of an active member (e.g., member <-> manager)."""
-    workspace = Workspace.query.get_or_404(workspace_id) # Need workspace to check owner
+    workspace = get_workspace_cached(workspace_id) # Need workspace to check owner
 
     # --- Permission Check: Only Owner or Admin can change roles ---
     # Using a stricter check here - maybe only owner/admin can promote/demote
     is_owner = workspace.owner_id == current_user.user_id
-    membership = WorkspaceMember.query.filter_by(
-        workspace_id=workspace_id, user_id=current_user.user_id, status='active'
-    ).first()
+    membership = workspace.member_by_user(current_user.user_id, status='active') # Members are selectin-loaded with the workspace, no extra SELECT
     is_admin = membership and membership.role == 'admin'
 
     if not (is_owner or is_admin):
         flash("You do not have permission to change member roles.", "danger")
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
-    member = WorkspaceMember.query.filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
+    member = WorkspaceMember.query.options(
+        joinedload(WorkspaceMember.user) # Loaded now for the flash message below
+    ).filter_by(id=member_id, workspace_id=workspace_id).first_or_404()
     new_role = request.form.get("new_role")
 
     # Validate new role
@@ -601,9 +773,10 @@ def change_role(workspace_id, member_id):
         return redirect(url_for("workspace_bp.view_workspace", workspace_id=workspace_id))
 
     try:
+        email = member.user.email # Read before commit expires the instance
         member.role = new_role
         db.session.commit()
-        flash(f"Role for {member.user.email} updated to {new_role}.", "success")
+        flash(f"Role for {email} updated to {new_role}.", "success")
         # TODO: Optionally send an email notification about the role change
     except Exception as e:
         db.session.rollback()
@@ -627,20 +800,22 @@ def path_exists_in_static(relative_path: str) -> bool:
     # Ensure the path doesn't start with a slash if it's meant to be relative to static_folder
     relative_path = relative_path.lstrip('/')
     full_path = os.path.join(current_app.static_folder, relative_path)
-    return os.path.isfile(full_path)
+    return static_file_exists(full_path)
 
 @workspace_bp.route("/members/<int:user_id>")
 @login_required
 def member_profile(user_id):
     """
     Renders a specific user's profile.
-    If the member's profile_pic_url is invalid, reset it to the default.
+    If the member's profile_pic_url is invalid, the default picture is shown instead.
     """
     member = User.query.get_or_404(user_id)
     # Use a default image path if the specific one doesn't exist or is empty
-    if not member.profile_pic_url or not path_exists_in_static(member.profile_pic_url):
-        member.profile_pic_url = "images/default-profile.png" # Assuming default is in static/images
+    # (kept local so the persistent User row is never dirtied by a GET)
+    display_pic = member.profile_pic_url
+    if not display_pic or not path_exists_in_static(display_pic):
+        display_pic = "images/default-profile.png" # Assuming default is in static/images
 
     # Pass the user object as 'user' to the template
-    return render_template("workspace_member.html", member=member) # Changed 'member=member' to 'user=member'
+    return render_template("workspace_member.html", member=member, display_pic=display_pic) # Changed 'member=member' to 'user=member'
 
@@ -1,18 +1,25 @@
 # run.py
 import eventlet
-eventlet.monkey_patch()
+# Green everything the server and DB drivers block on; os patching is not needed
+# (psycopg is a no-op unless psycopg2 is installed for a Postgres DATABASE_URI)
+eventlet.monkey_patch(socket=True, select=True, thread=True, time=True, psycopg=True)
 import logging
+import os
 from app import create_app, socketio
 from app.extensions import db
 
 app = create_app()
 
-# Configure logging to include line number
-logging.basicConfig(
-    format='%(asctime)s [%(levelname)s] %(filename)s:%(lineno)d - %(message)s',
-    level=logging.INFO
-)
+# Configure logging to include line number (unless a handler is already installed)
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        format='%(asctime)s [%(levelname)s] %(filename)s:%(lineno)d - %(message)s',
+        level=logging.INFO
+    )
 
 
 if __name__ == "__main__":
-    socketio.run(app, host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    # Debug (and with it template auto-reload) only when explicitly enabled for development
+    debug = os.environ.get("FLASK_DEBUG", "0").lower() in ("1", "true")
+    port = int(os.environ.get("PORT", "5001"))
+    socketio.run(app, host="0.0.0.0", port=port, debug=debug)
\ No newline at end of file